@@ -0,0 +1,149 @@
+import cv2
+import glob
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import CaptureConfig as cc  # local unofficial
+
+# 最後に使えたカメラを保存するファイル
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ImageDetect", "camera.json")
+
+max_cameras_to_try = 10  # /dev/video* が使えない環境で試すカメラの最大数
+probe_timeout = 3.0  # キャッシュしたカメラの確認と、並列の探索それぞれのタイムアウト (秒)
+
+
+def list_candidates():
+    """
+    試すべきカメラのデバイスインデックスを返す。
+    Linux では /dev/video* に存在するものだけを候補にする。
+    """
+    if sys.platform.startswith("linux"):
+        indices = []
+        for path in glob.glob("/dev/video*"):
+            match = re.fullmatch(r"/dev/video(\d+)", path)
+            if match:
+                indices.append(int(match.group(1)))
+        if indices:
+            return sorted(indices)
+    return list(range(max_cameras_to_try))
+
+
+def load_cache(path=CACHE_PATH):
+    """前回使えたカメラの情報を読み込む。無ければ None"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_cache(index, mode, requested=None, path=CACHE_PATH):
+    """使えたカメラのインデックスと、要求したモード・実際のモードを保存する"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"index": index, "mode": mode, "requested": requested, "time": time.time()}, f)
+    except OSError:
+        pass  # キャッシュに書けなくてもゲームは続行できる
+
+
+def probe(index, mode=None):
+    """カメラを開いて1フレーム読めるか確認する。使えれば開いたままのcapを返す"""
+    cap = cv2.VideoCapture(index)
+    if not cap.isOpened():
+        cap.release()
+        return None
+    if mode:
+        cc.apply_mode(cap, mode)
+    ret, _ = cap.read()
+    if not ret:
+        cap.release()
+        return None
+    return cap
+
+
+def _release_late(future):
+    """タイムアウト後に開けたカメラを解放する"""
+    if not future.cancelled() and future.exception() is None and future.result() is not None:
+        future.result().release()
+
+
+def open_camera(config=None, cache_path=CACHE_PATH, timeout=probe_timeout):
+    """
+    利用可能なカメラを探し、開いた状態の cv2.VideoCapture を返す。
+    1. キャッシュされたカメラをまず試す（前回決まったモードをそのまま設定する）
+    2. ダメなら残りの候補を並列に試し、最も小さいインデックスのものを使う
+    どちらも別のスレッドで試し、それぞれ timeout 秒までしか待たない（応答しないカメラで止まらない）。
+    見つけたカメラには config のモード（CaptureConfig 参照）を要求する。
+    戻り値: (camera_index, cap)。見つからなければ (None, None)
+    """
+    requested = dict(cc.DEFAULT_CONFIG)
+    if config:
+        requested.update(config)
+
+    cache = load_cache(cache_path)
+    if cache is not None:
+        # 要求するモードが前回と同じなら、前回実際に使えたモードをそのまま使う
+        same_request = cache.get("requested") == requested
+        cached_executor = ThreadPoolExecutor(max_workers=1)
+        future = cached_executor.submit(probe, cache["index"], cache.get("mode") if same_request else None)
+        cached_executor.shutdown(wait=False)
+        done, _ = wait([future], timeout=timeout)
+        cap = future.result() if future in done and future.exception() is None else None
+        if future not in done:
+            print(f"キャッシュされたカメラ {cache['index']} が応答しません。他のカメラを探します。")
+            future.add_done_callback(_release_late)  # 後で開けたら解放する
+        if cap is not None:
+            if not same_request:
+                save_cache(cache["index"], cc.negotiate(cap, requested), requested, cache_path)
+            return cache["index"], cap
+
+    candidates = [i for i in list_candidates() if cache is None or i != cache["index"]]
+    if not candidates:
+        return None, None
+
+    executor = ThreadPoolExecutor(max_workers=len(candidates))
+    futures = {index: executor.submit(probe, index) for index in candidates}
+    results = {}
+    chosen = None
+    deadline = time.time() + timeout
+    pending = set(futures.values())
+    while pending and chosen is None:
+        done, pending = wait(pending, timeout=max(0.0, deadline - time.time()), return_when=FIRST_COMPLETED)
+        if not done:
+            break  # タイムアウト
+        for index, future in futures.items():
+            if future in done:
+                results[index] = future.result() if future.exception() is None else None
+        # 小さいインデックスから順に、結果が出そろった範囲で使えるものを選ぶ
+        for index in candidates:
+            if index not in results:
+                break
+            if results[index] is not None:
+                chosen = index
+                break
+    if chosen is None:
+        # タイムアウトした場合は、その時点で使えたものの中から選ぶ
+        usable = [i for i in candidates if results.get(i) is not None]
+        chosen = usable[0] if usable else None
+
+    # 選ばれなかったカメラは解放する（まだ終わっていないものは終わり次第解放）
+    for index, future in futures.items():
+        if index == chosen:
+            continue
+        if index in results:
+            if results[index] is not None:
+                results[index].release()
+        else:
+            future.add_done_callback(_release_late)
+    executor.shutdown(wait=False)
+
+    if chosen is None:
+        return None, None
+    cap = results[chosen]
+    save_cache(chosen, cc.negotiate(cap, requested), requested, cache_path)
+    return chosen, cap
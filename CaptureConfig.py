@@ -0,0 +1,112 @@
+import cv2
+
+# YOLO の入力サイズ (長辺)。これより大きく撮ってもモデル側で縮小されるだけなので無駄になる
+model_input_size = 640
+
+# 要求するカメラのモード
+DEFAULT_CONFIG = {
+    "width": 640,
+    "height": 480,
+    "fourcc": "MJPG",  # USBカメラは MJPG の方が高いFPSを出せることが多い
+    "fps": 30,
+    "buffersize": 1,  # ドライバ側に古いフレームを溜めない
+}
+
+# 要求した解像度が使えない場合に順番に試す解像度
+FALLBACK_SIZES = [(640, 480), (640, 360), (800, 600), (1280, 720)]
+
+
+def fourcc_to_str(value):
+    """CAP_PROP_FOURCC の数値を "MJPG" のような文字列に変換する"""
+    value = int(value)
+    if not value:
+        return ""
+    return "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4))
+
+
+def describe_mode(cap):
+    """カメラが実際に使っている解像度・FPS・FOURCC・バッファ数を辞書で返す"""
+    return {
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "fourcc": fourcc_to_str(cap.get(cv2.CAP_PROP_FOURCC)),
+        "fps": float(cap.get(cv2.CAP_PROP_FPS)),
+        "buffersize": int(cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+    }
+
+
+def apply_mode(cap, mode):
+    """モードをそのままカメラに設定する（確認はしない）"""
+    # FOURCC は解像度より先に設定しないと反映されないドライバがある
+    if mode.get("fourcc"):
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*mode["fourcc"]))
+    if mode.get("width") and mode.get("height"):
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, mode["width"])
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, mode["height"])
+    if mode.get("fps"):
+        cap.set(cv2.CAP_PROP_FPS, mode["fps"])
+    if mode.get("buffersize"):
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, mode["buffersize"])
+
+
+def negotiate(cap, config=None, verbose=True):
+    """
+    要求したモードをカメラに設定し、実際に使えるようになったモードを返す。
+    解像度が使えなければ FALLBACK_SIZES を順番に試し、
+    どれも使えなければドライバが選んだ解像度をそのまま使う。
+    """
+    requested = dict(DEFAULT_CONFIG)
+    if config:
+        requested.update(config)
+
+    if requested.get("buffersize"):
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, requested["buffersize"])
+    if requested.get("fourcc"):
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*requested["fourcc"]))
+
+    sizes = [(requested["width"], requested["height"])]
+    sizes += [size for size in FALLBACK_SIZES if size not in sizes]
+    for width, height in sizes:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        granted = describe_mode(cap)
+        if (granted["width"], granted["height"]) == (width, height):
+            break
+
+    if requested.get("fps"):
+        cap.set(cv2.CAP_PROP_FPS, requested["fps"])
+
+    granted = describe_mode(cap)
+    if verbose:
+        print_mode(requested, granted)
+    return granted
+
+
+def print_mode(requested, granted):
+    """要求したモードと実際のモードを表示する"""
+    print("カメラのモード (要求 -> 実際):")
+    for key in ("width", "height", "fourcc", "fps", "buffersize"):
+        mark = "" if str(requested.get(key)) == str(granted.get(key)) else "  (変更されました)"
+        print(f"  {key}: {requested.get(key)} -> {granted.get(key)}{mark}")
+    if max(granted["width"], granted["height"]) > model_input_size:
+        print(f"  注意: 解像度がモデルの入力サイズ {model_input_size} より大きいため、推論前に縮小されます")
+
+
+def add_capture_arguments(parser):
+    """argparse にカメラのモードのオプションを追加する"""
+    parser.add_argument("--capture-width", type=int, default=DEFAULT_CONFIG["width"], help="カメラの幅")
+    parser.add_argument("--capture-height", type=int, default=DEFAULT_CONFIG["height"], help="カメラの高さ")
+    parser.add_argument("--fourcc", default=DEFAULT_CONFIG["fourcc"], help="カメラの FOURCC（空文字ならドライバに任せる）")
+    parser.add_argument("--capture-fps", type=float, default=DEFAULT_CONFIG["fps"], help="カメラのFPS")
+    parser.add_argument("--buffersize", type=int, default=DEFAULT_CONFIG["buffersize"], help="ドライバのバッファ数")
+
+
+def config_from_args(args):
+    """add_capture_arguments で追加したオプションから要求するモードを作る"""
+    return {
+        "width": args.capture_width,
+        "height": args.capture_height,
+        "fourcc": args.fourcc,
+        "fps": args.capture_fps,
+        "buffersize": args.buffersize,
+    }
@@ -0,0 +1,53 @@
+import bisect
+
+import numpy as np
+
+
+class ColorTable:
+    """
+    COLOR_MAPPING（しきい値の昇順に並んだ (しきい値, ANSIエスケープ, BGR, ...) のリスト）を
+    一度だけ表に変換しておき、スコアから色を二分探索で引く。
+    返すタプルは表に入っているものをそのまま返す（呼ぶたびに作らない）。
+
+    render を指定すると、4つ目の値（V1 の音名など）を render(値) に置き換えて持つ。
+    たとえば render=PlaySound.render_note なら、再生できる音のバッファが入る。
+
+        table = ColorTable(COLOR_MAPPING, default=(ce.Colors.BG_WHITE, (255, 255, 255)))
+        color_escape, box_color = table.lookup(total)
+        box_colors = table.box_colors(scores["total"])  # (N, 3) の配列
+    """
+
+    def __init__(self, mapping, default, render=None):
+        def compile_entry(entry):
+            entry = tuple(entry)
+            if render is not None and len(entry) > 2:
+                entry = entry[:2] + (render(entry[2]),) + entry[3:]
+            return entry
+
+        self.thresholds = [row[0] for row in mapping]
+        if self.thresholds != sorted(self.thresholds):
+            raise ValueError("COLOR_MAPPING はしきい値の昇順に並べてください")
+        # 最後はどのしきい値にも当てはまらなかったとき
+        self.entries = [compile_entry(row[1:]) for row in mapping] + [compile_entry(default)]
+        self._thresholds = np.asarray(self.thresholds, dtype=np.float64)
+        self._box_colors = np.array([entry[1] for entry in self.entries], dtype=np.uint8)
+
+    def index(self, total):
+        """total < しきい値 となる最初の行の番号（どれにも当てはまらなければ最後）"""
+        return bisect.bisect_right(self.thresholds, total)
+
+    def lookup(self, total):
+        """スコアに対応する (ANSIエスケープ, BGR, ...) を返す"""
+        return self.entries[self.index(total)]
+
+    def indices(self, totals):
+        """複数のスコアの行番号をまとめて求める"""
+        return np.searchsorted(self._thresholds, np.asarray(totals, dtype=np.float64), side="right")
+
+    def lookup_many(self, totals):
+        """複数のスコアに対応する (ANSIエスケープ, BGR, ...) のリスト"""
+        return [self.entries[i] for i in self.indices(totals).tolist()]
+
+    def box_colors(self, totals):
+        """複数のスコアのボックスの色を (N, 3) の uint8 配列で返す"""
+        return self._box_colors[self.indices(totals)]
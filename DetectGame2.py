@@ -1,71 +1,52 @@
 import cv2
-import time
-from ultralytics import YOLO
+
+import FrameGrabber as fg  # local unofficial
+import CameraDiscovery as cam  # local unofficial
+import FrameSource as fs  # local unofficial
+import CaptureConfig as cc  # local unofficial
+import GameOptions as go  # local unofficial
+import DisplaySink as ds  # local unofficial
+import ModelManager as mm  # local unofficial
+import ScoringEngine as se  # local unofficial
 
 import sys
 print("Python executable:", sys.executable)
 print("Python version:", sys.version)
 
 # static global
-# YOLOモデルをロード
-model = YOLO("best.pt")  # トレーニング済みモデルを指定
+# YOLOモデル（import しただけでは読み込まず、main() で裏で読み込みを始める）
+model = mm.ModelManager("best.pt")  # トレーニング済みモデルを指定
+display = ds.WindowSink()  # 表示先（ヘッドレスなら main() で置き換える）
+scorer = se.ScoringEngine(se.FLOAT_RULES)  # 採点ルール
 
 # ゲーム設定
 time_limit = 30  # 制限時間 (秒)
 score = 0  # 初期スコア
 
-def get_camera():
+def get_camera(config=None):
     """
-    利用可能なカメラデバイスを順番に試し、接続可能なものを取得する。
+    利用可能なカメラデバイスを探し、開いた状態のカメラを返す。
+    config でカメラに要求する解像度などを指定できる（CaptureConfig 参照）。
     """
-    max_cameras_to_try = 10  # 試すカメラの最大数
-    for camera_index in range(max_cameras_to_try):
-        cap = cv2.VideoCapture(camera_index)
-        if cap.isOpened():
-            print(f"カメラを取得しました: デバイスインデックス {camera_index}")
-            return camera_index
-        else:
-            cap.release()
+    camera_index, cap = cam.open_camera(config)  # 並列に探索し、前回のカメラはキャッシュから使う
+    if cap is not None:
+        print(f"カメラを取得しました: デバイスインデックス {camera_index}")
+        return cap
     print("利用可能なカメラが見つかりませんでした。")
     return None
 
 
 def detect_objects(frame):
-    """YOLOモデルでオブジェクトを検出し、ラベルと信頼度を返す"""
-    results = model(frame)
-    predictions = results[0].boxes.data
-    objects = []
-    for pred in predictions:
-        class_id = int(pred[5])  # クラスID
-        confidence = float(pred[4])  # 信頼度
-        bbox = pred[:4]  # バウンディングボックス（x1, y1, x2, y2）
-        width = bbox[2] - bbox[0]
-        height = bbox[3] - bbox[1]
-        area = width * height
-        objects.append((model.names[class_id], confidence, area, bbox))
-    return objects
+    """YOLOモデルでオブジェクトを検出し、クラスID・信頼度・面積・ボックスの構造化配列を返す"""
+    return model.detect_records(frame)  # 読み込みが終わっていなければここで待つ
 
 def calculate_score(objects, frame):
     """検出結果に基づいてスコアを計算し、アノテーションを描画"""
     global score
-    for label, confidence, area, bbox in objects:
-        # 基本加点: オブジェクトが存在するだけで+10点
-        base_score = 10
-        # 面積加点: 面積が大きいほど高得点（最大+50点）
-        area_score = min(area // 1000, 50)
-        # 信頼度加点: 100%に近い場合、または50%に近い場合に加点（最大+20点）
-        confidence_score = max(20 - abs(confidence - 1.0) * 100, 0) + max(20 - abs(confidence - 0.5) * 100, 0)
-
-        # ラベルによる加点
-        if label == "kinoko":
-            label_score = 20
-        elif label == "takenoko":
-            label_score = 30
-        else:
-            label_score = 0
-
-        # 合計得点
-        total = base_score + area_score + confidence_score + label_score
+    # 基本加点・面積加点・信頼度加点・ラベルによる加点は ScoringEngine.FLOAT_RULES の表で決まる
+    totals = scorer.totals(objects, model.names)
+    for (class_id, confidence, area, bbox), total in zip(objects.tolist(), totals.tolist()):
+        label = model.names[class_id]
         print(f"{label} (信頼度: {confidence:.2f}, 面積: {area:.0f}) -> 加点: {total}")
         score += int(total)
 
@@ -80,49 +61,68 @@ def calculate_score(objects, frame):
         cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
         cv2.putText(frame, f"{label} ({int(total)}pts)", (int((x1+x2)/2), int((y1+y2)/2 - 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
 
-def main():
-    # カメラの取得を試みる
-    camera_id = get_camera()
-    if camera_id is None:
+def main(options=None):
+    global display
+    if options is None:
+        options = go.parse_args([])  # コマンドラインを使わない場合は既定の設定
+    display = ds.sink_from_args(options)  # ウィンドウ、またはヘッドレス
+
+    # カメラを開いている間に裏でモデルを読み込む
+    model.load_async(options.backend, options.threads)
+
+    # カメラの取得を試みる（録画などの供給元が指定されていればそれを使う）
+    cap = fs.source_from_args(options)
+    if cap is None:
+        cap = get_camera(cc.config_from_args(options))
+    if cap is None:
         exit()
 
     # ゲーム開始
-    cap = cv2.VideoCapture(camera_id)  # カメラを起動
-    start_time = time.time()
+    grabber = fg.FrameGrabber(cap, preview_fps=options.preview_fps).start()  # 読み込みは別スレッドで行う
+    clock = grabber.now  # ライブ映像なら現在時刻、録画なら再生位置
+    last_seq = 0
+
+    # 最初の採点が遅くならないように、実際の入力と同じ大きさで空推論しておく
+    first_frame = grabber.peek()
+    if first_frame is not None and options.warmup_runs > 0:
+        model.warmup(first_frame.shape, options.warmup_runs)
+
+    start_time = clock()
     last_score_time = start_time
 
     print("ゲーム開始！制限時間は30秒です。")
 
     while True:
-        elapsed_time = time.time() - start_time
+        elapsed_time = clock() - start_time
         if elapsed_time > time_limit:
             print(f"ゲーム終了！最終スコア: {score}")
             break
 
-        # カメラからフレームを取得
-        ret, frame = cap.read()
+        # 最新のフレームを取得（古いフレームは捨てる）
+        ret, frame, frame_time, last_seq = grabber.wait_new(last_seq)
         if not ret:
             print("カメラ映像を取得できませんでした。")
             break
 
         # 5秒ごとにスコアを計算
-        if time.time() - last_score_time >= 5:
+        if clock() - last_score_time >= 5:
             objects = detect_objects(frame)
             calculate_score(objects, frame)
-            last_score_time = time.time()
+            last_score_time = clock()
 
             # 採点結果を表示するため0.5秒停止
-            cv2.imshow("Game", frame)
-            cv2.waitKey(1000)
+            display.show("Game", frame)
+            display.wait(1000)
 
         # フレームを表示（オプション）
-        cv2.imshow("Game", frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        display.show("Game", frame)
+        if display.poll_key() == ord('q'):
             print("ゲームを中断しました。")
             break
 
-    cap.release()
-    cv2.destroyAllWindows()
+    model.print_latency_report()
+    grabber.stop()
+    display.close()
 
 if __name__ == "__main__":
-    main()
+    main(go.parse_args())
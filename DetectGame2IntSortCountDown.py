@@ -1,21 +1,41 @@
 import cv2
-import time
-from ultralytics import YOLO
 
 import ColorEscape as ce  # local unofficial
+import FrameGrabber as fg  # local unofficial
+import FramePool as fp  # local unofficial
+import CameraDiscovery as cam  # local unofficial
+import FrameSource as fs  # local unofficial
+import CaptureConfig as cc  # local unofficial
+import GameOptions as go  # local unofficial
+import DisplaySink as ds  # local unofficial
+import ModelManager as mm  # local unofficial
+import ScoreRecords as sr  # local unofficial
+import ScoringEngine as se  # local unofficial
+import SessionStats as ss  # local unofficial
+import ResultsRenderer as rr  # local unofficial
+import RevealAnimator as ra  # local unofficial
+import ColorTable as ct  # local unofficial
+import GlyphCache as gc  # local unofficial
+import QuantileSketch as qs  # local unofficial
+import InferenceWorker as iw  # local unofficial
 
 import sys
 ce.print_colored(ce.Colors.BLUE, f"Python executable:{sys.executable}" )
 ce.print_colored(ce.Colors.GREEN, f"Python version:{sys.version}")
 
 # static global
-# YOLOモデルをロード
-model = YOLO("best.pt")  # トレーニング済みモデルを指定
+# YOLOモデル（import しただけでは読み込まず、main() で裏で読み込みを始める）
+model = mm.ModelManager("best.pt")  # トレーニング済みモデルを指定
+display = ds.WindowSink()  # 表示先（ヘッドレスなら main() で置き換える）
+scorer = se.ScoringEngine(se.INTEGER_RULES)  # 採点ルール
 
 # ゲーム設定
 time_limit = 30  # 制限時間 (秒)
 score = 0  # 初期スコア
-all_scores = []  # 全てのスコアを格納するリスト
+results = rr.ResultsSummary()  # 結果画面に出す上位・下位のスコアと加点のヒストグラム
+session_stats = ss.SessionStats()  # 採点のたびに更新する統計
+reveal = ra.RevealScheduler()  # 採点したボックスを1件ずつ出す演出
+session_quantiles = qs.SessionQuantiles()  # 信頼度・面積・加点の分位点
 
 
 COLOR_MAPPING = [
@@ -25,206 +45,242 @@ COLOR_MAPPING = [
     (75, ce.Colors.BG_BLUE, (255, 0, 0)),
     (float('inf'), ce.Colors.BG_CYAN, (255, 255, 0))
 ]
+# COLOR_MAPPING を一度だけ表にしておく
+color_table = ct.ColorTable(COLOR_MAPPING, default=(ce.Colors.BG_WHITE, (255, 255, 255)))
 
-def get_camera():
+def get_camera(config=None):
     """
-    利用可能なカメラデバイスを順番に試し、接続可能なものを取得する。
+    利用可能なカメラデバイスを探し、開いた状態のカメラを返す。
+    config でカメラに要求する解像度などを指定できる（CaptureConfig 参照）。
     """
-    max_cameras_to_try = 10  # 試すカメラの最大数
-    for camera_index in range(max_cameras_to_try):
-        cap = cv2.VideoCapture(camera_index)
-        if cap.isOpened():
-            print(f"カメラを取得しました: デバイスインデックス {camera_index}")
-            return camera_index
-        else:
-            cap.release()
+    camera_index, cap = cam.open_camera(config)  # 並列に探索し、前回のカメラはキャッシュから使う
+    if cap is not None:
+        print(f"カメラを取得しました: デバイスインデックス {camera_index}")
+        return cap
     print("利用可能なカメラが見つかりませんでした。")
     return None
 
 
 def detect_objects(frame):
-    """YOLOモデルでオブジェクトを検出し、ラベルと信頼度を返す"""
-    results = model(frame)
-    predictions = results[0].boxes.data
-    objects = []
-    for pred in predictions:
-        class_id = int(pred[5])  # クラスID
-        confidence = float(pred[4])  # 信頼度
-        bbox = pred[:4]  # バウンディングボックス（x1, y1, x2, y2）
-        width = bbox[2] - bbox[0]
-        height = bbox[3] - bbox[1]
-        area = width * height
-        objects.append((model.names[class_id], confidence, area, bbox))
-    return objects
+    """YOLOモデルでオブジェクトを検出し、クラスID・信頼度・面積・ボックスの構造化配列を返す"""
+    return model.detect_records(frame)  # 読み込みが終わっていなければここで待つ
 
 
 def calculate_score(objects):
     """検出結果に基づいてスコアを計算し、結果を返す"""
-    global score
-    scores = []
-    for label, confidence, area, bbox in objects:
-        # 基本加点: オブジェクトが存在するだけで+10点
-        base_score = 10
-        # 面積加点: 面積が大きいほど高得点（最大+50点）
-        area_score = int(min(area // 1000, 50))
-        # 信頼度加点: 100%に近い場合、または50%に近い場合に加点（最大+20点）
-        confidence_score = int(max(20 - abs(confidence - 1.0) * 100, 0) + max(20 - abs(confidence - 0.5) * 100, 0))
-
-        # ラベルによる加点
-        if label == "kinoko":
-            label_score = 20
-        elif label == "takenoko":
-            label_score = -30
-        else:
-            label_score = 0
-
-        # 合計得点
-        total = base_score + area_score + confidence_score + label_score
-        scores.append((label, confidence, area, total, bbox))
-
-    return scores
+    # 基本加点・面積加点・信頼度加点・ラベルによる加点は ScoringEngine.INTEGER_RULES の表で決まる
+    return scorer.score_records(objects, model.names)
 
 
 def get_color_and_box(total_score):
     """スコアに応じた色とボックスカラーを返す"""
-    for threshold, color_escape, box_color in COLOR_MAPPING:
-        if total_score < threshold:
-            return color_escape, box_color
-    return ce.Colors.BG_WHITE, (255, 255, 255)  # Default fallback
+    return color_table.lookup(total_score)
 
 
-def display_scores(scores, frame):
-    """スコアを表示し、バウンディングボックスを同期して描画"""
-    for label, confidence, area, total, bbox in scores:
-        color_escape, box_color = get_color_and_box(total)
+def display_scores(scores, now):
+    """
+    スコアを表示し、バウンディングボックスを同期して描画する予定を立てる。
+    実際の描画は以降のフレームで reveal.draw() が行うので、ここでは待たない。
+    """
+    entries = color_table.lookup_many(scores["total"])  # 色はまとめて引く
+    for (label, confidence, area, total, bbox), entry in zip(sr.as_tuples(scores, model.names), entries):
+        color_escape, box_color = entry
+        message = f"{label} (信頼度: {confidence:.2f}, 面積: {area:05.0f}) -> 加点: {total:03}"
 
-        # ラベルをコンソールに表示
-        ce.print_colored(
-            color_escape,
-            f"{label} (信頼度: {confidence:.2f}, 面積: {area:05.0f}) -> 加点: {total:03}"
-        )
+        def on_reveal(color_escape=color_escape, message=message):
+            # ボックスを出したときにラベルをコンソールに表示
+            ce.print_colored(color_escape, message)
+
+        reveal.add(now, bbox, f"{label} ({total:03}pts)", box_color, on_reveal)
+
+def score_objects(objects, now):
+    """検出結果を採点して統計を更新し、ボックスを出す予定を立てる"""
+    frame_scores = calculate_score(objects)
+    results.update(frame_scores)
+    session_stats.update(frame_scores)
+    session_quantiles.update(frame_scores)
 
-        # フレーム上に描画
-        x1, y1, x2, y2 = map(int, bbox)
-        cv2.rectangle(frame, (x1, y1), (x2, y2), box_color, 2)
-        cv2.putText(frame, f"{label} ({total:03}pts)", (x1, y1 - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, box_color, 2)
-        # フレームを表示
-        cv2.imshow("Game", frame)
-        cv2.waitKey(50)
+    # 算出したスコアとアノテーションを、以降のフレームに1件ずつ出す（0.5秒間表示をキープ）
+    display_scores(frame_scores, now)
+
+    # 5秒ごとの合計スコアを表示
+    frame_total = int(frame_scores["total"].sum())
+    print(f"5秒ごとの合計スコア: {frame_total}")
 
 def display_countdown(frame, countdown_time):
     """カウントダウンを画面中央に表示する"""
     height, width, _ = frame.shape
     center_x, center_y = width // 2, height // 2
-    cv2.putText(frame, str(countdown_time), (center_x - 50, center_y),
+    # 数字は 1〜5 しかないので、描いた文字をキャッシュして使い回す
+    gc.put_text(frame, str(countdown_time), (center_x - 50, center_y),
                 cv2.FONT_HERSHEY_SIMPLEX, 3, (0, 0, 255), 5)
 
-def display_sorted_scores(scores, frame):
-    """スコアを昇順でソートして表示"""
-    sorted_scores = sorted(scores, key=lambda x: x[3])  # スコアでソート
-    display_scores(sorted_scores, frame)
-
-def main():
-    # カメラの取得を試みる
-    camera_id = get_camera()
-    if camera_id is None:
-        exit()
-
-    # ゲーム開始
-    cap = cv2.VideoCapture(camera_id)  # カメラを起動
-    start_time = time.time()
-    last_score_time = start_time
-
-    print("ゲーム開始！制限時間は30秒です。")
-
-    while True:
-        elapsed_time = time.time() - start_time
-        if elapsed_time > time_limit:
-            break
-
-        # カメラからフレームを取得
-        ret, frame = cap.read()
-        if not ret:
-            print("カメラ映像を取得できませんでした。")
-            break
-
-        cd = 5 - int(time.time() - last_score_time)
-
-        # 5秒ごとにスコアを計算
-        if cd <= 0:
-            objects = detect_objects(frame)
-            frame_scores = calculate_score(objects)
-            all_scores.extend(frame_scores)
-
-            # 算出したスコアとアノテーションを表示
-            display_scores(frame_scores, frame)
-
-            # 0.5秒間表示をキープ
-            cv2.imshow("Game", frame)
-            cv2.waitKey(500)
-
-            # 5秒ごとの合計スコアを表示
-            frame_total = sum(score[3] for score in frame_scores)
-            print(f"5秒ごとの合計スコア: {frame_total}")
-
-            last_score_time = time.time()
-        else:
-            display_countdown(frame, cd)
-        # フレームを表示（オプション）
-        cv2.imshow("Game", frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            print("ゲームを中断しました。")
-            break
-
-    # 終了
-    cv2.waitKey(500)
-    print("ゲーム終了！")
-    # 最終スコアを表示
-    cv2.waitKey(500)
-    print("=== 最終結果 ===")
-    final_total_score = sum(score[3] for score in all_scores)
-
-    # 統計情報を計算
-    confidences = [score[1] for score in all_scores]
-    areas = [score[2] for score in all_scores]
-    points = [score[3] for score in all_scores]
-    object_count = len(all_scores)
-
-    min_conf = min(confidences) if confidences else 0
-    max_conf = max(confidences) if confidences else 0
-    min_area = min(areas) if areas else 0
-    max_area = max(areas) if areas else 0
-    min_score = min(points) if points else 0
-    max_score = max(points) if points else 0
-
-    # 全スコアを表示
-    display_sorted_scores(all_scores, frame)
-
-    # 統計情報を表示
-    cv2.waitKey(500)
-    ce.print_colored(ce.Colors.BG_RED, f"最小信頼度: {min_conf:.2f}")
-    cv2.waitKey(250)
-    ce.print_colored(ce.Colors.BG_CYAN, f"最大信頼度: {max_conf:.2f}")
-    cv2.waitKey(500)
-    ce.print_colored(ce.Colors.BG_RED, f"最小面積: {min_area:05.0f}")
-    cv2.waitKey(250)
-    ce.print_colored(ce.Colors.BG_CYAN, f"最大面積: {max_area:05.0f}")
-    cv2.waitKey(500)
-    ce.print_colored(ce.Colors.BG_RED, f"最小加点: {min_score:03}")
-    cv2.waitKey(250)
-    ce.print_colored(ce.Colors.BG_CYAN, f"最大加点: {max_score:03}")
-    cv2.waitKey(500)
-    ce.print_colored(ce.Colors.BG_GREEN, f"認識したオブジェクト数: {object_count}")
-
-    cv2.waitKey(500)
-    ce.print_colored(ce.Colors.REVERCE, "最終スコアの合計:")
-    ce.print_colored(ce.Colors.REVERCE, f"{final_total_score}")
-    cv2.waitKey(500)
-
-    cap.release()
-    cv2.destroyAllWindows()
+def display_sorted_scores(results, frame):
+    """
+    上位・下位のスコアを昇順で表示する。
+    全検出を1件ずつ描き直す代わりに、ボックスとヒストグラムを1枚の結果画面にまとめて1回だけ表示する。
+    """
+    for label, confidence, area, total, bbox in sr.as_tuples(results.records(), model.names):
+        ce.print_colored(
+            get_color_and_box(total)[0],
+            f"{label} (信頼度: {confidence:.2f}, 面積: {area:05.0f}) -> 加点: {total:03}"
+        )
+    print(" / ".join(f"{label}: {count}" for label, count in zip(results.histogram_labels(), results.histogram.tolist())))
+    if frame is None:
+        return  # フレームを1枚も取得できなかった場合は結果画面を出さない
+    display.show("Game", results.render(frame, model.names, lambda total: get_color_and_box(total)[1]))
+    display.wait(1)
+
+def parse_args(argv=None):
+    """共通のオプションに、分位点スケッチの保存先と推論プロセスの設定を加えて解析する"""
+    parser = go.build_parser()
+    qs.add_sketch_arguments(parser)
+    iw.add_worker_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(options=None):
+    global display, model
+    if options is None:
+        options = parse_args([])  # コマンドラインを使わない場合は既定の設定
+    # フレームのバッファは使い回す（読み込み・描画・表示で同じバッファを使い、表示し終わったら空ける）
+    pool = fp.pool_from_args(options)
+    # 表示は専用のスレッドで行い、最新のフレームだけを表示する（macOS のウィンドウはメインスレッドで表示する）
+    display = ds.start_renderer(ds.sink_from_args(options), getattr(options, "render_fps", 60), pool)
+
+    worker = None
+    if getattr(options, "inference_worker", False):
+        # 推論は別のプロセスで行い、フレームは共有メモリの枠で渡す（結果は待たずに後のフレームで受け取る）
+        worker = model = iw.InferenceWorker(model.weights, slots=options.ring_slots)
+
+    grabber = None
+    try:
+        # カメラを開いている間に裏でモデルを読み込む
+        model.load_async(options.backend, options.threads)
+
+        # カメラの取得を試みる（録画などの供給元が指定されていればそれを使う）
+        cap = fs.source_from_args(options)
+        if cap is None:
+            cap = get_camera(cc.config_from_args(options))
+        if cap is None:
+            exit()
+
+        # ゲーム開始
+        grabber = fg.FrameGrabber(cap, preview_fps=options.preview_fps, pool=pool).start()  # 読み込みは別スレッドで行う
+        clock = grabber.now  # ライブ映像なら現在時刻、録画なら再生位置
+        last_seq = 0
+
+        # 最初の採点が遅くならないように、実際の入力と同じ大きさで空推論しておく
+        first_frame = grabber.peek()
+        if first_frame is not None and options.warmup_runs > 0:
+            model.warmup(first_frame.shape, options.warmup_runs)
+
+        start_time = clock()
+        last_score_time = start_time
+
+        print("ゲーム開始！制限時間は30秒です。")
+
+        while True:
+            elapsed_time = clock() - start_time
+            if elapsed_time > time_limit:
+                break
+
+            # 最新のフレームを取得（古いフレームは捨てる）
+            ret, frame, frame_time, last_seq = grabber.wait_new(last_seq)
+            if not ret:
+                print("カメラ映像を取得できませんでした。")
+                break
+
+            cd = 5 - int(clock() - last_score_time)
+
+            # 5秒ごとにスコアを計算
+            if cd <= 0:
+                if worker is None:
+                    score_objects(detect_objects(frame), clock())
+                elif worker.submit(frame, block=False) is None:
+                    print("推論プロセスが空いていないため、このフレームは採点しません。")
+                last_score_time = clock()
+            else:
+                display_countdown(frame, cd)
+            if worker is not None:
+                # 推論プロセスで終わった分を採点する
+                for _, objects in worker.poll():
+                    score_objects(objects, clock())
+            reveal.draw(frame, clock())
+            # フレームを表示（オプション）
+            display.show("Game", frame)
+            if display.poll_key() == ord('q'):
+                print("ゲームを中断しました。")
+                break
+
+        # 終了
+        if worker is not None:
+            # 推論中のフレームがあれば、その結果も採点に入れる
+            for _, objects in worker.drain():
+                score_objects(objects, clock())
+        display.wait(500)
+        print("ゲーム終了！")
+        # 最終スコアを表示
+        display.wait(500)
+        print("=== 最終結果 ===")
+        final_total_score = session_stats.total_score
+
+        # 統計情報（採点のたびに更新してあるので、ここで全スコアを見直さない）
+        overall = session_stats.overall
+        object_count = session_stats.object_count
+        min_conf = overall["confidence"].get_min()
+        max_conf = overall["confidence"].get_max()
+        min_area = overall["area"].get_min()
+        max_area = overall["area"].get_max()
+        min_score = int(overall["total"].get_min())
+        max_score = int(overall["total"].get_max())
+
+        # 上位・下位のスコアと結果画面を表示
+        display_sorted_scores(results, frame)
+
+        # 統計情報を表示
+        display.wait(500)
+        ce.print_colored(ce.Colors.BG_RED, f"最小信頼度: {min_conf:.2f}")
+        display.wait(250)
+        ce.print_colored(ce.Colors.BG_CYAN, f"最大信頼度: {max_conf:.2f}")
+        display.wait(500)
+        ce.print_colored(ce.Colors.BG_RED, f"最小面積: {min_area:05.0f}")
+        display.wait(250)
+        ce.print_colored(ce.Colors.BG_CYAN, f"最大面積: {max_area:05.0f}")
+        display.wait(500)
+        ce.print_colored(ce.Colors.BG_RED, f"最小加点: {min_score:03}")
+        display.wait(250)
+        ce.print_colored(ce.Colors.BG_CYAN, f"最大加点: {max_score:03}")
+        display.wait(500)
+        ce.print_colored(ce.Colors.BG_GREEN, f"認識したオブジェクト数: {object_count}")
+        for label, count, class_total, class_mean in session_stats.class_summary(model.names):
+            ce.print_colored(ce.Colors.GREEN, f"  {label}: {count}個, 加点の合計 {class_total}, 平均 {class_mean:.1f}")
+        display.wait(500)
+        for line in session_quantiles.report_lines():
+            ce.print_colored(ce.Colors.BG_BLUE, line)
+        sketch_out = getattr(options, "sketch_out", None)
+        if sketch_out:
+            session_quantiles.save(sketch_out)
+            print(f"分位点スケッチを保存しました: {sketch_out}")
+
+        display.wait(500)
+        ce.print_colored(ce.Colors.REVERCE, "最終スコアの合計:")
+        ce.print_colored(ce.Colors.REVERCE, f"{final_total_score}")
+        display.wait(500)
+
+        model.print_latency_report()
+        print(f"映像の読み込み: {grabber.describe_rate()}")
+        if isinstance(display, ds.RenderThread):
+            print(f"表示: {display.describe()}")
+        print(f"フレームのバッファ: {pool.describe()}")
+    finally:
+        # 途中で例外が起きても (Ctrl+C や推論プロセスの終了など)、読み込み・表示・推論プロセスを止めて共有メモリを解放する
+        if grabber is not None:
+            grabber.stop()
+        display.close()
+        if worker is not None:
+            worker.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(parse_args())
\ No newline at end of file
@@ -1,129 +1,147 @@
-import cv2
-import time
 import tkinter as tk
 from tkinter import scrolledtext
-from ultralytics import YOLO
+
+import FrameGrabber as fg  # local unofficial
+import FramePool as fp  # local unofficial
+import Detector as dt  # local unofficial
+import CameraDiscovery as cam  # local unofficial
+import FrameSource as fs  # local unofficial
+import CaptureConfig as cc  # local unofficial
+import GameOptions as go  # local unofficial
+import DisplaySink as ds  # local unofficial
+import ModelManager as mm  # local unofficial
+import ScoringEngine as se  # local unofficial
 
 # static global
-# YOLOモデルをロード
-model = YOLO("best.pt")  # トレーニング済みモデルを指定
+# YOLOモデル（import しただけでは読み込まず、main() で裏で読み込みを始める）
+model = mm.ModelManager("best.pt")  # トレーニング済みモデルを指定
+display = ds.WindowSink()  # 表示先（ヘッドレスなら main() で置き換える）
+scorer = se.ScoringEngine(se.FLOAT_RULES)  # 採点ルール
 
 # ゲーム設定
 time_limit = 30  # 制限時間 (秒)
 score = 0  # 初期スコア
 
-# GUIのセットアップ
-root = tk.Tk()
-root.title("Object Detection Game")
-root.geometry("500x400")
+# GUI（ヘッドレスのときは作らない）
+root = None
+message_box = None
+
+def setup_gui():
+    """GUIのセットアップ"""
+    global root, message_box
+    root = tk.Tk()
+    root.title("Object Detection Game")
+    root.geometry("500x400")
 
-# メッセージ表示用のTextウィジェット
-message_box = scrolledtext.ScrolledText(root, wrap=tk.WORD, height=20, width=60)
-message_box.pack(pady=10)
+    # メッセージ表示用のTextウィジェット
+    message_box = scrolledtext.ScrolledText(root, wrap=tk.WORD, height=20, width=60)
+    message_box.pack(pady=10)
 
 def update_gui_message(message):
-    """GUI上のメッセージボックスにテキストを追加"""
+    """GUI上のメッセージボックスにテキストを追加（GUIがなければ標準出力に表示）"""
+    if message_box is None:
+        print(message)
+        return
     message_box.insert(tk.END, message + "\n")
     message_box.see(tk.END)
     root.update()
 
-def get_camera():
+def get_camera(config=None):
     """
-    利用可能なカメラデバイスを順番に試し、接続可能なものを取得する。
+    利用可能なカメラデバイスを探し、開いた状態のカメラを返す。
+    config でカメラに要求する解像度などを指定できる（CaptureConfig 参照）。
     """
-    max_cameras_to_try = 10  # 試すカメラの最大数
-    for camera_index in range(max_cameras_to_try):
-        cap = cv2.VideoCapture(camera_index)
-        if cap.isOpened():
-            update_gui_message(f"カメラを取得しました: デバイスインデックス {camera_index}")
-            return camera_index
-        else:
-            cap.release()
+    camera_index, cap = cam.open_camera(config)  # 並列に探索し、前回のカメラはキャッシュから使う
+    if cap is not None:
+        update_gui_message(f"カメラを取得しました: デバイスインデックス {camera_index}")
+        return cap
     update_gui_message("利用可能なカメラが見つかりませんでした。")
     return None
 
 def detect_objects(frame):
-    """YOLOモデルでオブジェクトを検出し、ラベルと信頼度を返す"""
-    results = model(frame)
-    predictions = results[0].boxes.data
-    objects = []
-    for pred in predictions:
-        class_id = int(pred[5])  # クラスID
-        confidence = float(pred[4])  # 信頼度
-        bbox = pred[:4]  # バウンディングボックス（x1, y1, x2, y2）
-        width = bbox[2] - bbox[0]
-        height = bbox[3] - bbox[1]
-        area = width * height
-        objects.append((model.names[class_id], confidence, area))
-    return objects
+    """YOLOモデルでオブジェクトを検出し、クラスID・信頼度・面積・ボックスの構造化配列を返す"""
+    return model.detect_records(frame)  # 読み込みが終わっていなければここで待つ
 
 def calculate_score(objects):
     """検出結果に基づいてスコアを計算"""
     global score
-    for label, confidence, area in objects:
-        # 基本加点: オブジェクトが存在するだけで+10点
-        base_score = 10
-        # 面積加点: 面積が大きいほど高得点（最大+50点）
-        area_score = min(area // 1000, 50)
-        # 信頼度加点: 100%に近い場合、または50%に近い場合に加点（最大+20点）
-        confidence_score = max(20 - abs(confidence - 1.0) * 100, 0) + max(20 - abs(confidence - 0.5) * 100, 0)
-
-        # ラベルによる加点
-        if label == "kinoko":
-            label_score = 20
-        elif label == "takenoko":
-            label_score = 30
-        else:
-            label_score = 0
-
-        # 合計得点
-        total = base_score + area_score + confidence_score + label_score
+    # 基本加点・面積加点・信頼度加点・ラベルによる加点は ScoringEngine.FLOAT_RULES の表で決まる
+    totals = scorer.totals(objects, model.names)
+    for (class_id, confidence, area, bbox), total in zip(objects.tolist(), totals.tolist()):
+        label = model.names[class_id]
         update_gui_message(f"{label} (信頼度: {confidence:.2f}, 面積: {area:.0f}) -> 加点: {total}")
         score += total
 
-def main():
-    # カメラの取得を試みる
-    camera_id = get_camera()
-    if camera_id is None:
+def main(options=None):
+    global display
+    if options is None:
+        options = go.parse_args([])  # コマンドラインを使わない場合は既定の設定
+    display = ds.sink_from_args(options)  # ウィンドウ、またはヘッドレス
+
+    # カメラを開いている間に裏でモデルを読み込む
+    model.load_async(options.backend, options.threads)
+
+    # カメラの取得を試みる（録画などの供給元が指定されていればそれを使う）
+    cap = fs.source_from_args(options)
+    if cap is None:
+        cap = get_camera(cc.config_from_args(options))
+    if cap is None:
         exit()
 
     # ゲーム開始
-    cap = cv2.VideoCapture(camera_id)  # カメラを起動
-    start_time = time.time()
+    pool = fp.pool_from_args(options)  # フレームのバッファは使い回す
+    grabber = fg.FrameGrabber(cap, preview_fps=options.preview_fps, pool=pool).start()  # 読み込みは別スレッドで行う
+    clock = grabber.now  # ライブ映像なら現在時刻、録画なら再生位置
+    last_seq = 0
+
+    # 最初の採点が遅くならないように、実際の入力と同じ大きさで空推論しておく
+    first_frame = grabber.peek()
+    if first_frame is not None and options.warmup_runs > 0:
+        model.warmup(first_frame.shape, options.warmup_runs)
+
+    start_time = clock()
 
     update_gui_message("ゲーム開始！制限時間は30秒です。")
 
     while True:
-        elapsed_time = time.time() - start_time
+        elapsed_time = clock() - start_time
         if elapsed_time > time_limit:
             update_gui_message(f"ゲーム終了！最終スコア: {score}")
             break
 
-        # カメラからフレームを取得
-        ret, frame = cap.read()
+        # 最新のフレームを取得（古いフレームは捨てる）
+        ret, frame, frame_time, last_seq = grabber.wait_new(last_seq)
         if not ret:
             update_gui_message("カメラ映像を取得できませんでした。")
             break
 
         # オブジェクト検出
         objects = detect_objects(frame)
-        predictions = model(frame)
-        annotated_frame = predictions[0].plot()
+        # 推論し直してコピーに描く (plot) のではなく、検出結果を読み込んだバッファに直接描く
+        annotated_frame = dt.draw_detections(frame, objects, model.names)
 
         # スコア計算
         calculate_score(objects)
 
         # フレームを表示（オプション）
         # cv2.imshow("Game", frame)
-        cv2.imshow("DXI stage2", annotated_frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        display.show("DXI stage2", annotated_frame)
+        if display.poll_key() == ord('q'):
             update_gui_message("ゲームを中断しました。")
             break
 
-    cap.release()
-    cv2.destroyAllWindows()
+    model.print_latency_report()
+    print(f"フレームのバッファ: {pool.describe()}")
+    grabber.stop()
+    display.close()
 
 if __name__ == "__main__":
-    # GUIの開始とmain関数の実行
-    root.after(100, main)
-    root.mainloop()
+    options = go.parse_args()
+    if options.headless or options.output:
+        # ヘッドレスでは GUI を作らずに実行
+        main(options)
+    else:
+        # GUIの開始とmain関数の実行
+        setup_gui()
+        root.after(100, lambda: main(options))
+        root.mainloop()
@@ -0,0 +1,270 @@
+import time
+
+import DetectGame2IntSortCountDown as game  # local unofficial
+import ColorEscape as ce  # local unofficial
+import CaptureConfig as cc  # local unofficial
+import DisplaySink as ds  # local unofficial
+import FrameSource as fs  # local unofficial
+import GameOptions as go  # local unofficial
+import ModelManager as mm  # local unofficial
+import Pipeline as pl  # local unofficial
+import QuantileSketch as qs  # local unofficial
+
+# ステージごとの既定の配置と、上流からの辺のキューの扱い（--placement / --policy で変えられる）
+# capture と render はカメラやウィンドウを持つので、このプロセスのスレッドで動かす
+LAYOUT = {
+    "detect": {"placement": pl.THREAD, "policy": pl.LATEST_ONLY, "maxsize": 1},
+    "score": {"placement": pl.THREAD, "policy": pl.BLOCK, "maxsize": 2},
+    "render": {"placement": pl.THREAD, "policy": pl.LATEST_ONLY, "maxsize": 1},
+    "sound": {"placement": pl.THREAD, "policy": pl.DROP_OLDEST, "maxsize": 4},
+}
+MOVABLE_STAGES = ("detect",)  # プロセスに移せるステージ
+
+score_interval = 5  # 採点の間隔 (秒)
+
+# 加点と鳴らす音（DetectGameV1 の COLOR_MAPPING と同じ区切り）
+NOTE_MAPPING = [
+    (0, "C4"),
+    (25, "E4"),
+    (50, "G4"),
+    (75, "A4"),
+    (float('inf'), "C5")
+]
+
+
+class CaptureStage:
+    """カメラ・録画からフレームを読み、制限時間が過ぎたら終わる"""
+
+    def __init__(self, cap):
+        self.cap = cap
+        self.start_time = None
+
+    def __call__(self):
+        ret, frame = self.cap.read()
+        if not ret:
+            print("カメラ映像を取得できませんでした。")
+            raise StopIteration
+        # 録画なら再生位置、ライブ映像なら現在時刻
+        timestamp = getattr(self.cap, "last_timestamp", None)
+        timestamp = timestamp if timestamp is not None else time.time()
+        if self.start_time is None:
+            self.start_time = timestamp
+        elapsed = timestamp - self.start_time
+        if elapsed > game.time_limit:
+            raise StopIteration
+        return {"time": timestamp, "elapsed": elapsed, "frame": frame}
+
+
+class StageModel:
+    """
+    推論を別のプロセスのステージで行う場合に、親で game.model の代わりに置く。
+    親ではモデルを読み込まず、クラス名と推論時間はステージのプロセスから検出結果と一緒に受け取る。
+    """
+
+    def __init__(self, weights):
+        self.weights = weights
+        self.names = {}
+        self.warmup_latency = mm.LatencyStats()
+        self.latency = mm.LatencyStats()
+
+    def update(self, report):
+        """DetectStage が item["model"] に付けた (クラス名, 空推論の時間, 推論時間) を受け取る"""
+        self.names, self.warmup_latency, self.latency = report
+
+    def print_latency_report(self):
+        """ステージのプロセスで測った空推論とゲーム中の推論時間を表示する"""
+        print(f"推論時間 (ウォームアップ, 推論のプロセス): {self.warmup_latency.describe()}")
+        print(f"推論時間 (ゲーム中, 推論のプロセス): {self.latency.describe()}")
+
+
+class DetectStage:
+    """
+    score_interval 秒ごとに推論する。それ以外のフレームはカウントダウンだけ付けて流す。
+    別のプロセスで動かす場合は、そのプロセスの中で自分のモデルを読み込んで空推論し（options が必要）、
+    推論したフレームにはクラス名と推論時間を item["model"] として付けて親に返す。
+    """
+
+    def __init__(self, interval=score_interval, options=None, weights="best.pt"):
+        self.interval = interval
+        self.options = options
+        self.weights = weights
+        self.last_score_time = 0.0
+        self.model = None
+
+    def prepare(self, frame):
+        """
+        ステージのプロセスの中で最初のフレームを受け取ったときに、親のモデルは使わずに読み込み、
+        最初の採点が遅くならないように同じ大きさで空推論しておく
+        """
+        self.model = mm.ModelManager(self.weights, self.options.backend, self.options.threads)
+        if self.options.warmup_runs > 0:
+            self.model.warmup(frame.shape, self.options.warmup_runs)
+
+    def detect(self, frame):
+        if self.options is None:
+            return game.detect_objects(frame)
+        return self.model.detect_records(frame)
+
+    def __call__(self, item):
+        if self.options is not None and self.model is None:
+            self.prepare(item["frame"])
+        countdown = self.interval - int(item["elapsed"] - self.last_score_time)
+        item["objects"] = None
+        if countdown <= 0:
+            item["objects"] = self.detect(item["frame"])
+            self.last_score_time = item["elapsed"]
+            if self.model is not None:
+                item["model"] = (dict(self.model.names), self.model.warmup_latency, self.model.latency)
+        item["countdown"] = countdown
+        return item
+
+
+def score_stage(item):
+    """採点して、ボックスを出す予定を立てる"""
+    item["scores"] = None
+    if "model" in item:
+        game.model.update(item["model"])  # 推論のプロセスから届いたクラス名と推論時間
+    if item["objects"] is not None:
+        frame_scores = game.calculate_score(item["objects"])
+        game.results.update(frame_scores)
+        game.session_stats.update(frame_scores)
+        game.session_quantiles.update(frame_scores)
+        game.display_scores(frame_scores, item["time"])
+        print(f"5秒ごとの合計スコア: {int(frame_scores['total'].sum())}")
+        item["scores"] = frame_scores
+    return item
+
+
+def has_scores(item):
+    return item["scores"] is not None
+
+
+class RenderStage:
+    """カウントダウンと採点したボックスを描いて表示し、'q' でパイプラインを止める"""
+
+    def __init__(self, pipe, display):
+        self.pipe = pipe
+        self.display = display
+        self.last_frame = None
+
+    def __call__(self, item):
+        frame = item["frame"]
+        if item["countdown"] > 0:
+            game.display_countdown(frame, item["countdown"])
+        game.reveal.draw(frame, item["time"])
+        self.display.show("Game", frame)
+        self.last_frame = frame
+        if self.display.poll_key() == ord('q'):
+            print("ゲームを中断しました。")
+            self.pipe.stop()
+
+
+class SoundStage:
+    """採点したフレームの加点に応じて音を鳴らす（鳴らしている間も他のステージは止まらない）"""
+
+    def __init__(self):
+        import PlaySound  # local unofficial (音を鳴らすときだけ sounddevice が必要)
+        self.ps = PlaySound
+
+    def __call__(self, item):
+        for total in item["scores"]["total"].tolist():
+            note = next(note for threshold, note in NOTE_MAPPING if total < threshold)
+            self.ps.play_note(note)
+
+
+def build_pipeline(cap, display, layout=LAYOUT, sound=False, options=None):
+    """get_camera / detect_objects / calculate_score / display_scores / PlaySound.play_note からパイプラインを組み立てる"""
+    pipe = pl.Pipeline()
+    render = RenderStage(pipe, display)
+    pipe.add_source("capture", CaptureStage(cap))
+    in_process = layout["detect"]["placement"] == pl.PROCESS
+    detect = DetectStage(options=options if in_process else None, weights=game.model.weights)
+    pipe.add_stage("detect", detect, **layout["detect"])
+    pipe.add_stage("score", score_stage, **layout["score"])
+    pipe.add_stage("render", render, **layout["render"])
+    if sound:
+        pipe.add_stage("sound", SoundStage(), after="score", when=has_scores, **layout["sound"])
+    return pipe, render
+
+
+def parse_args(argv=None):
+    """ゲームのオプションに、パイプラインの配置とキューの扱いを加えて解析する"""
+    parser = go.build_parser("Object Detection Game (pipeline)")
+    qs.add_sketch_arguments(parser)
+    parser.add_argument("--placement", action="append", default=[], metavar="STAGE=thread|process",
+                        help=f"ステージの配置（変えられるもの: {', '.join(MOVABLE_STAGES)}）")
+    parser.add_argument("--policy", action="append", default=[], metavar="STAGE=" + "|".join(pl.POLICIES),
+                        help=f"ステージへのキューの扱い（{', '.join(LAYOUT)}）")
+    parser.add_argument("--sound", action="store_true", help="採点したときに音を鳴らす（sounddevice が必要）")
+    return parser.parse_args(argv)
+
+
+def layout_from_args(args):
+    """既定の LAYOUT をコマンドラインの指定で上書きする"""
+    layout = {name: dict(settings) for name, settings in LAYOUT.items()}
+    for name, placement in pl.parse_assignments(args.placement, pl.PLACEMENTS).items():
+        if name not in MOVABLE_STAGES:
+            raise ValueError(f"{name} は別のプロセスに移せません")
+        layout[name]["placement"] = placement
+    for name, policy in pl.parse_assignments(args.policy, pl.POLICIES).items():
+        if name not in layout:
+            raise ValueError(f"未知のステージです: {name}")
+        layout[name]["policy"] = policy
+    return layout
+
+
+def main(options=None):
+    if options is None:
+        options = parse_args([])  # コマンドラインを使わない場合は既定の設定
+    layout = layout_from_args(options)
+    display = ds.sink_from_args(options)
+    game.display = display  # 結果画面もこの表示先に出す
+
+    in_process = layout["detect"]["placement"] == pl.PROCESS
+    if in_process:
+        # 推論のプロセスがモデルを読み込むので、親では読み込まない（クラス名と推論時間はそのプロセスから受け取る）
+        game.model = StageModel(game.model.weights)
+    else:
+        # カメラを開いている間に裏でモデルを読み込む
+        game.model.load_async(options.backend, options.threads)
+
+    cap = fs.source_from_args(options)
+    if cap is None:
+        cap = game.get_camera(cc.config_from_args(options))
+    if cap is None:
+        exit()
+
+    # 最初の採点が遅くならないように、実際の入力と同じ大きさで空推論しておく
+    ret, first_frame = cap.read()
+    # （推論を別のプロセスで行う場合は、そのプロセスが最初のフレームで空推論する）
+    if ret and options.warmup_runs > 0 and not in_process:
+        game.model.warmup(first_frame.shape, options.warmup_runs)
+
+    pipe, render = build_pipeline(cap, display, layout, options.sound, options)
+    print("ゲーム開始！制限時間は30秒です。")
+    pipe.run()
+    print("ゲーム終了！")
+
+    # 最終結果
+    print("=== 最終結果 ===")
+    if render.last_frame is not None:
+        game.display_sorted_scores(game.results, render.last_frame)
+    for line in game.session_quantiles.report_lines():
+        ce.print_colored(ce.Colors.BG_BLUE, line)
+    sketch_out = getattr(options, "sketch_out", None)
+    if sketch_out:
+        game.session_quantiles.save(sketch_out)
+        print(f"分位点スケッチを保存しました: {sketch_out}")
+    ce.print_colored(ce.Colors.BG_GREEN, f"認識したオブジェクト数: {game.session_stats.object_count}")
+    ce.print_colored(ce.Colors.REVERCE, "最終スコアの合計:")
+    ce.print_colored(ce.Colors.REVERCE, f"{game.session_stats.total_score}")
+    display.wait(500)
+
+    pipe.report()
+    game.model.print_latency_report()
+    cap.release()
+    display.close()
+
+
+if __name__ == "__main__":
+    main(parse_args())
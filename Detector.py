@@ -0,0 +1,258 @@
+import argparse
+import glob
+import hashlib
+import os
+import shutil
+
+import numpy as np
+
+import ScoreRecords as sr  # local unofficial
+
+# 書き出したモデル（ONNX / TorchScript）を保存するディレクトリ
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ImageDetect", "models")
+
+imgsz = 640  # モデルの入力サイズ
+
+
+class Detector:
+    """
+    推論ランタイムに依存しない検出器のインターフェース。
+    サブクラスは names と infer() を実装する。
+
+    infer(frame) は (N, 6) の配列 [x1, y1, x2, y2, confidence, class_id] を返し、
+    detect(frame) は DetectGame の detect_objects と同じ (label, confidence, area, bbox) のリストを返す。
+    """
+
+    names = {}  # クラスIDとラベル名の対応
+
+    def infer(self, frame):
+        raise NotImplementedError
+
+    def detect(self, frame):
+        return to_objects(self.infer(frame), self.names)
+
+    def detect_records(self, frame):
+        """検出結果を ScoreRecords.DETECTION_DTYPE の構造化配列で返す"""
+        return sr.detections_from_columns(*split_columns(self.infer(frame)))
+
+    def plot(self, frame):
+        """検出結果を描画したフレームを返す（results[0].plot() の代わり）"""
+        return draw_detections(frame.copy(), self.detect_records(frame), self.names)
+
+
+def draw_detections(frame, records, names):
+    """
+    検出結果 (ScoreRecords.DETECTION_DTYPE) のボックスとラベルを frame に直接描く。
+    plot() と違ってフレームをコピーしないので、推論済みの結果を表示するときはこちらを使う。
+    """
+    import cv2
+    for class_id, confidence, area, bbox in records.tolist():
+        x1, y1, x2, y2 = map(int, bbox)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(frame, f"{names[class_id]} {confidence:.2f}", (x1, y1 - 5),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+    return frame
+
+
+def split_columns(data):
+    """
+    (N, 6) の検出結果を列ごとに分ける。面積も配列全体で一度に計算する。
+    戻り値: (class_ids, confidences, areas, boxes)
+    """
+    data = np.asarray(data, dtype=np.float32).reshape(-1, 6)
+    boxes = data[:, :4]  # バウンディングボックス（x1, y1, x2, y2）
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return data[:, 5].astype(np.int64), data[:, 4], areas, boxes
+
+
+def to_objects(data, names):
+    """(N, 6) の検出結果を (label, confidence, area, bbox) のリストにする"""
+    class_ids, confidences, areas, boxes = split_columns(data)
+    labels = [names[class_id] for class_id in class_ids.tolist()]
+    return list(zip(labels, confidences.tolist(), areas.tolist(), boxes))
+
+
+# バックエンド名 -> Detector を作る関数
+_registry = {}
+
+
+def register_backend(name):
+    """
+    バックエンドを登録するデコレータ。
+
+        @register_backend("onnx")
+        def _create_onnx(weights, threads=None):
+            return OnnxDetector(weights, threads=threads)
+    """
+    def decorator(factory):
+        _registry[name] = factory
+        return factory
+    return decorator
+
+
+def backend_names():
+    """登録されているバックエンド名の一覧"""
+    return list(_registry)
+
+
+def create_detector(name, weights="best.pt", **options):
+    """名前を指定して Detector を作る"""
+    if name not in _registry:
+        raise ValueError(f"未知のバックエンドです: {name} (使えるもの: {', '.join(_registry)})")
+    return _registry[name](weights, **options)
+
+
+def weights_hash(path):
+    """重みファイルの SHA-256 を返す（キャッシュのキーに使う）"""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def export_cached(weights, export_format, suffix, size=imgsz, cache_dir=CACHE_DIR):
+    """
+    ultralytics でモデルを書き出し、重みのハッシュをキーにしてキャッシュする。
+    重みが同じなら2回目以降は書き出さずにキャッシュのパスを返す。
+    """
+    path = os.path.join(cache_dir, f"{weights_hash(weights)[:16]}-{size}{suffix}")
+    if not os.path.exists(path):
+        from ultralytics import YOLO  # 書き出すときだけ必要
+        print(f"{weights} を {export_format} に書き出しています...")
+        exported = YOLO(weights).export(format=export_format, imgsz=size)
+        os.makedirs(cache_dir, exist_ok=True)
+        shutil.move(exported, path)
+    return path
+
+
+class YoloDetector(Detector):
+    """ultralytics (PyTorch) で推論する"""
+
+    def __init__(self, weights="best.pt"):
+        from ultralytics import YOLO  # 読み込みに時間がかかるので必要になってから import する
+        self.yolo = YOLO(weights)
+        self.names = self.yolo.names
+
+    def infer(self, frame):
+        # 推論のたびに ultralytics がコンソールに結果を出すと遅くなる（推論時間にも入る）ので出さない
+        results = self.yolo(frame, verbose=False)
+        # 1行ずつテンソルを触らず、フレームごとに一度だけ NumPy に変換する
+        return results[0].boxes.data.cpu().numpy()
+
+    def plot(self, frame):
+        return self.yolo(frame, verbose=False)[0].plot()
+
+
+def set_torch_threads(threads):
+    """PyTorch の intra-op スレッド数を設定する（None なら既定値のまま）"""
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+
+@register_backend("pytorch")
+def _create_pytorch(weights, threads=None):
+    set_torch_threads(threads)
+    return YoloDetector(weights)
+
+
+@register_backend("torchscript")
+def _create_torchscript(weights, threads=None):
+    set_torch_threads(threads)
+    # ultralytics は書き出した TorchScript も YOLO() でそのまま読み込める
+    return YoloDetector(export_cached(weights, "torchscript", ".torchscript"))
+
+
+@register_backend("onnx")
+def _create_onnx(weights, threads=None):
+    import OnnxBackend  # local unofficial (onnxruntime は使うときだけ読み込む)
+    return OnnxBackend.OnnxDetector(weights, threads=threads)
+
+
+@register_backend("onnx-int8")
+def _create_onnx_int8(weights, threads=None):
+    import Quantize  # local unofficial
+    return Quantize.create_int8_detector(weights, "dynamic", threads)
+
+
+@register_backend("onnx-int8-static")
+def _create_onnx_int8_static(weights, threads=None):
+    import Quantize  # local unofficial (キャリブレーション画像は Quantize.calibration_dir)
+    return Quantize.create_int8_detector(weights, "static", threads)
+
+
+def box_iou(box, boxes):
+    """1つのボックスと複数のボックスの IoU"""
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def compare_detections(reference, candidate, iou_min=0.9, conf_tol=0.05):
+    """
+    2つの検出結果 (N, 6) を比べる。
+    同じクラスで IoU が最大のものを対応させ、IoU と信頼度の差が許容範囲かを調べる。
+    戻り値: 問題点の文字列のリスト（空なら一致）
+    """
+    problems = []
+    if len(reference) != len(candidate):
+        problems.append(f"検出数が違います: {len(reference)} != {len(candidate)}")
+    used = np.zeros(len(candidate), dtype=bool)
+    for ref in reference:
+        same_class = (candidate[:, 5] == ref[5]) & ~used
+        if not same_class.any():
+            problems.append(f"クラス {int(ref[5])} (信頼度 {ref[4]:.2f}) が見つかりません")
+            continue
+        ious = np.where(same_class, box_iou(ref[:4], candidate[:, :4]), -1.0)
+        best = int(ious.argmax())
+        used[best] = True
+        if ious[best] < iou_min:
+            problems.append(f"クラス {int(ref[5])} のボックスがずれています (IoU {ious[best]:.3f})")
+        if abs(candidate[best, 4] - ref[4]) > conf_tol:
+            problems.append(f"クラス {int(ref[5])} の信頼度が違います: {ref[4]:.3f} != {candidate[best, 4]:.3f}")
+    return problems
+
+
+def check_parity(backends, image_dir, weights="best.pt", iou_min=0.9, conf_tol=0.05):
+    """
+    フィクスチャ画像に対して複数のバックエンドの結果を比べる。
+    最初のバックエンドを基準にする。すべて一致すれば True を返す。
+    """
+    import cv2
+    paths = sorted(glob.glob(os.path.join(image_dir, "*")))
+    images = [(path, cv2.imread(path)) for path in paths]
+    images = [(path, image) for path, image in images if image is not None]
+    if not images:
+        print(f"画像が見つかりません: {image_dir}")
+        return False
+
+    detectors = {name: create_detector(name, weights) for name in backends}
+    reference_name = backends[0]
+    ok = True
+    for path, image in images:
+        reference = detectors[reference_name].infer(image)
+        for name in backends[1:]:
+            problems = compare_detections(reference, detectors[name].infer(image), iou_min, conf_tol)
+            for problem in problems:
+                print(f"{os.path.basename(path)} [{reference_name} vs {name}] {problem}")
+            ok = ok and not problems
+    print("一致しました" if ok else "一致しませんでした")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="バックエンド間で検出結果が一致するか確認する")
+    parser.add_argument("images", help="フィクスチャ画像のディレクトリ")
+    parser.add_argument("--weights", default="best.pt")
+    parser.add_argument("--backends", nargs="+", default=backend_names(),
+                        help="比べるバックエンド（最初のものが基準）")
+    parser.add_argument("--iou-min", type=float, default=0.9, help="ボックスの IoU の下限")
+    parser.add_argument("--conf-tol", type=float, default=0.05, help="信頼度の差の許容値")
+    args = parser.parse_args()
+    raise SystemExit(0 if check_parity(args.backends, args.images, args.weights, args.iou_min, args.conf_tol) else 1)
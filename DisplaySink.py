@@ -0,0 +1,246 @@
+import sys
+import threading
+import time
+from collections import deque
+
+import cv2
+
+NO_KEY = 0xFF  # cv2.waitKey(...) & 0xFF でキーが押されていないときの値
+
+
+class WindowSink:
+    """
+    これまでどおり cv2.imshow でウィンドウに表示し、cv2.waitKey で待つ・キーを読む。
+
+        display.show("Game", frame)
+        if display.poll_key() == ord('q'):
+            ...
+        display.wait(500)  # 表示をキープする
+    """
+
+    headless = False
+
+    def show(self, name, frame):
+        cv2.imshow(name, frame)
+
+    def wait(self, ms):
+        """ms ミリ秒待ち、その間に押されたキーを返す"""
+        return cv2.waitKey(ms) & 0xFF
+
+    def poll_key(self):
+        """ウィンドウのイベントを処理し、押されたキーを返す"""
+        return cv2.waitKey(1) & 0xFF
+
+    def close(self):
+        cv2.destroyAllWindows()
+
+
+class NullSink:
+    """
+    画面を使わない（ヘッドレス）。表示したフレームは数えるだけで捨てる。
+    キー入力はなく、wait() は pace が True のときだけ実際の時計で待つ。
+    pace が False なら演出のための待ちは行わず、速さはカメラと推論だけで決まる。
+    """
+
+    headless = True
+
+    def __init__(self, pace=False):
+        self.pace = pace
+        self.frames = 0
+
+    def show(self, name, frame):
+        self.frames += 1
+
+    def wait(self, ms):
+        if self.pace:
+            time.sleep(ms / 1000)
+        return NO_KEY
+
+    def poll_key(self):
+        return NO_KEY
+
+    def close(self):
+        pass
+
+
+class FileSink(NullSink):
+    """
+    ヘッドレスで、表示するはずだったフレームをファイルに書き出す。
+    - 拡張子 .raw: RawFrames の形式（再生や再採点に使える）
+    - 拡張子 .bgr: BGR の生データをそのまま書き続ける（名前付きパイプにすれば ffmpeg などに流せる）
+    - それ以外: cv2.VideoWriter の動画 (mp4v)
+    window を指定すると、そのウィンドウ名のフレームだけを書き出す。
+    """
+
+    def __init__(self, path, fps=30, pace=False, window=None):
+        super().__init__(pace)
+        self.path = path
+        self.fps = fps
+        self.window = window
+        self._writer = None
+        self._shape = None
+
+    def _open(self, frame):
+        height, width = frame.shape[:2]
+        self._shape = frame.shape
+        if self.path.endswith(".bgr"):
+            self._writer = open(self.path, "wb")
+        elif self.path.endswith(".raw"):
+            import RawFrames  # local unofficial
+            self._writer = RawFrames.RawRecorder(self.path, width, height, frame.shape[2] if frame.ndim == 3 else 1)
+        else:
+            self._writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*"mp4v"), self.fps, (width, height))
+
+    def show(self, name, frame):
+        if self.window is not None and name != self.window:
+            return
+        super().show(name, frame)
+        if self._writer is None:
+            self._open(frame)
+        if frame.shape != self._shape:
+            # 最初のフレームと大きさが違う場合（結果画面など）は合わせる
+            frame = cv2.resize(frame, (self._shape[1], self._shape[0]))
+        if self.path.endswith(".bgr"):
+            self._writer.write(frame.tobytes())
+        else:
+            self._writer.write(frame)
+
+    def close(self):
+        if self._writer is None:
+            return
+        if self.path.endswith((".bgr", ".raw")):
+            self._writer.close()
+        else:
+            self._writer.release()
+        self._writer = None
+
+
+class RenderThread:
+    """
+    表示を専用のスレッドで行う。表示先 (WindowSink など) と同じ使い方ができる。
+    show() は最新のフレームを置いていくだけで待たず、表示スレッドが render_fps の間隔で
+    いちばん新しいフレームだけを表示する（間のフレームは捨てる）。
+    imshow が遅くても、カメラの読み込みや推論の速さには影響しない。
+
+    imshow / waitKey / destroyAllWindows はすべて表示スレッドから呼ぶ。
+    macOS ではウィンドウをメインスレッド以外から扱えないので、start_renderer() で作るとウィンドウの表示先は
+    このクラスを使わずにメインスレッドで表示する。
+    pool (FramePool) を指定すると、置いていったフレームを表示し終わるまで使用中にしておく
+    （表示する前にバッファが使い回されないようにする）。
+    """
+
+    def __init__(self, sink, render_fps=60, pool=None):
+        self.sink = sink
+        self.pool = pool
+        self.headless = sink.headless
+        self.interval = 1.0 / render_fps if render_fps else 0.0
+        self._lock = threading.Lock()
+        self._pending = {}  # ウィンドウ名 -> まだ表示していない最新のフレーム
+        self._keys = deque()  # 表示スレッドで受け取ったキー
+        self._running = False
+        self._thread = None
+        self._started_at = None
+        self.submitted = 0  # show() で受け取った枚数
+        self.shown = 0  # 実際に表示した枚数
+
+    def start(self):
+        self._running = True
+        self._started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="RenderThread", daemon=True)
+        self._thread.start()
+        return self
+
+    def _render_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for name, frame in pending.items():
+            self.sink.show(name, frame)
+            self.shown += 1
+            self._release(frame)
+
+    def _release(self, frame):
+        if self.pool is not None:
+            self.pool.release(frame)
+
+    def _run(self):
+        while self._running:
+            start = time.perf_counter()
+            self._render_pending()
+            key = self.sink.poll_key()
+            if key != NO_KEY:
+                with self._lock:
+                    self._keys.append(key)
+            time.sleep(max(self.interval - (time.perf_counter() - start), 0.0))
+        self._render_pending()  # 最後に置かれたフレームを表示してから閉じる
+        self.sink.close()
+
+    def show(self, name, frame):
+        """フレームを置いていく（前のフレームがまだ表示されていなければ置き換える）"""
+        if self.pool is not None:
+            self.pool.retain(frame)
+        with self._lock:
+            replaced = self._pending.get(name)
+            self._pending[name] = frame
+            self.submitted += 1
+        if replaced is not None:
+            self._release(replaced)  # 表示されずに捨てたフレーム
+
+    def poll_key(self):
+        """表示スレッドで受け取ったキーを1つ返す"""
+        with self._lock:
+            return self._keys.popleft() if self._keys else NO_KEY
+
+    def wait(self, ms):
+        """表示をキープする。表示は止めずにこのスレッドだけが待つ"""
+        if self.headless:
+            self.sink.wait(ms)  # ヘッドレスでは --pace のときだけ待つ
+        else:
+            time.sleep(ms / 1000)
+        return self.poll_key()
+
+    def close(self):
+        """表示スレッドを止め、表示先を閉じる"""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def describe(self):
+        """表示の速さと、捨てたフレームの数"""
+        elapsed = time.time() - self._started_at if self._started_at else 0.0
+        if elapsed <= 0:
+            return "なし"
+        return (f"{self.shown / elapsed:.1f} fps "
+                f"(受け取り {self.submitted}枚, 表示 {self.shown}枚, 捨てた {self.submitted - self.shown}枚)")
+
+
+def start_renderer(sink, render_fps=60, pool=None):
+    """
+    表示先を専用のスレッドで動かし始める (RenderThread)。
+    macOS (Cocoa) は imshow / waitKey をメインスレッド以外から呼ぶと動かないので、
+    ウィンドウに表示する場合は表示先をそのまま返し、これまでどおりメインスレッドで表示する。
+    """
+    if sys.platform == "darwin" and not sink.headless:
+        return sink
+    return RenderThread(sink, render_fps, pool).start()
+
+
+def add_display_arguments(parser):
+    """argparse に表示のオプションを追加する"""
+    parser.add_argument("--headless", action="store_true",
+                        help="ウィンドウを出さずに実行する（キー入力なし、演出のための待ちもしない）")
+    parser.add_argument("--output", default=None,
+                        help="表示するフレームを書き出すファイル（.raw / .bgr / 動画）。指定するとヘッドレスになる")
+    parser.add_argument("--pace", action="store_true",
+                        help="ヘッドレスでも表示をキープする待ち時間を実際に待つ")
+    parser.add_argument("--render-fps", type=float, default=60.0,
+                        help="表示スレッドを使う場合の表示の上限 (fps)")
+
+
+def sink_from_args(args):
+    """コマンドラインの設定から表示先を作る"""
+    if getattr(args, "output", None):
+        return FileSink(args.output, fps=getattr(args, "fps", None) or 30, pace=args.pace)
+    if getattr(args, "headless", False):
+        return NullSink(pace=args.pace)
+    return WindowSink()
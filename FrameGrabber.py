@@ -0,0 +1,184 @@
+import threading
+import time
+
+
+class FrameGrabber:
+    """
+    カメラ読み込みを専用スレッドで行い、常に最新のフレームだけを保持する。
+    ゲームループ側は read() でブロックせずに最新フレームを受け取れる。
+
+    動画ファイルなどの録画（FrameSource.live が False のもの）は、
+    ベンチマークの再現性のためフレームを捨てずに1枚ずつ順番に渡す。
+
+    frame_stride / preview_fps を指定すると、使わないフレームは grab() だけで読み飛ばし、
+    ループに渡すフレームだけを retrieve() でデコードする。
+
+    pool (FramePool) を指定すると、デコード先のバッファを使い回す。
+    read() / wait_new() で受け取ったフレームは、次に read() / wait_new() を呼ぶまで書き換えられない。
+    それより長く使う場合は pool.retain() / release() するか、pool.copy() でコピーする。
+    """
+
+    def __init__(self, cap, frame_stride=1, preview_fps=None, pool=None):
+        self.cap = cap  # cv2.VideoCapture 互換 (grab/retrieve/release を持つもの)
+        self.frame_stride = max(1, int(frame_stride))  # N枚に1枚だけデコードする
+        self.preview_interval = 1.0 / preview_fps if preview_fps else 0.0  # デコードの最小間隔 (秒)
+        self._grab_count = 0
+        self._last_retrieve_time = None
+        self.drop_frames = getattr(cap, "live", True)  # ライブ映像なら古いフレームは捨てる
+        self._consumed_seq = 0  # ループ側が受け取った最後のフレーム番号
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._frame = None
+        self._timestamp = 0.0
+        self._seq = 0  # 取得したフレームの通し番号
+        self._ret = True
+        self._running = False
+        self._thread = None
+        self._started_at = None  # 読み込みを始めた時刻（速さの計算用）
+        self.pool = pool
+        self._shape = None  # プールから取り出すバッファの大きさ（最初のフレームで決まる）
+        self._handed = None  # ループに渡して、まだ返してもらっていないフレーム
+
+    def start(self):
+        """読み込みスレッドを開始する"""
+        if self._running:
+            return self
+        self._running = True
+        self._started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="FrameGrabber", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while self._running:
+            if not self.drop_frames:
+                # 録画の場合は、前のフレームが受け取られるまで次を読まない
+                with self._new_frame:
+                    self._new_frame.wait_for(lambda: self._consumed_seq >= self._seq or not self._running)
+                    if not self._running:
+                        break
+            ret = self.cap.grab()
+            if ret:
+                # 供給元が時刻を持っていればそれを使う（録画の再生位置など）
+                timestamp = getattr(self.cap, "last_timestamp", None)
+                timestamp = timestamp if timestamp is not None else time.time()
+                self._grab_count += 1
+                if not self._should_retrieve(timestamp):
+                    continue  # デコードせずに読み飛ばす
+                ret, frame = self._retrieve()
+            previous = None
+            with self._new_frame:
+                if not ret:
+                    # カメラが切断された場合は終了を通知する
+                    self._ret = False
+                    self._running = False
+                    self._new_frame.notify_all()
+                    break
+                previous, self._frame = self._frame, frame
+                self._timestamp = timestamp
+                self._last_retrieve_time = timestamp
+                self._seq += 1
+                self._new_frame.notify_all()
+            if self.pool is not None:
+                self.pool.release(previous)  # ループが使っていなければ空きに戻る
+
+    def _retrieve(self):
+        """デコードする。プールがあれば空いているバッファに直接書かせる"""
+        if self.pool is None:
+            return self.cap.retrieve()
+        # 渡したバッファに書かない供給元（画像ファイルなど）には渡さない。cv2.VideoCapture は書く
+        fills = getattr(self.cap, "fills_image", True)
+        buffer = self.pool.acquire(self._shape) if fills and self._shape is not None and self.pool.size else None
+        ret, frame = self.cap.retrieve(buffer) if buffer is not None else self.cap.retrieve()
+        if not ret:
+            self.pool.accept(buffer, None)
+            return ret, frame
+        # 最初のフレームや大きさが合わない場合などは、供給元が確保した配列が返される。
+        # バッファに書かれたときだけ使い回しとして数え、そうでなければ返された配列をプールに入れる
+        frame = self.pool.accept(buffer, frame)
+        if self._shape is None:
+            self._shape = frame.shape
+        return ret, frame
+
+    def _should_retrieve(self, timestamp):
+        """このフレームをデコードしてループに渡すかどうか"""
+        if (self._grab_count - 1) % self.frame_stride != 0:
+            return False
+        if self.preview_interval and self._last_retrieve_time is not None:
+            return timestamp - self._last_retrieve_time >= self.preview_interval
+        return True
+
+    def read(self):
+        """
+        最新のフレームを返す（ブロックしない）。
+        戻り値: (ret, frame, timestamp, seq)
+        まだ1枚も取得していない場合は最初のフレームが届くまで待つ。
+        """
+        with self._new_frame:
+            while self._seq == 0 and self._ret:
+                self._new_frame.wait()
+            if not self._ret and self._frame is None:
+                return False, None, 0.0, self._seq
+            self._mark_consumed()
+            return self._ret, self._frame, self._timestamp, self._seq
+
+    def peek(self):
+        """
+        最初のフレームが届くまで待ち、最新のフレームを返す。
+        受け取り済みにはしないので、録画でもフレームを読み飛ばさない。
+        """
+        with self._new_frame:
+            self._new_frame.wait_for(lambda: self._seq > 0 or not self._ret)
+            return self._frame
+
+    def wait_new(self, last_seq, timeout=None):
+        """last_seq より新しいフレームが届くまで待ってから返す"""
+        with self._new_frame:
+            self._new_frame.wait_for(lambda: self._seq > last_seq or not self._ret, timeout)
+            ret = self._ret and self._frame is not None
+            self._mark_consumed()
+            return ret, self._frame, self._timestamp, self._seq
+
+    def _mark_consumed(self):
+        """
+        ロックを持った状態で呼ぶ。録画の場合は次のフレームの読み込みを許可する。
+        プールがあれば、渡すフレームを使用中にし、前に渡したフレームを返してもらう。
+        """
+        if self.pool is not None and self._handed is not self._frame:
+            self.pool.retain(self._frame)
+            self.pool.release(self._handed)
+            self._handed = self._frame
+        if self._consumed_seq != self._seq:
+            self._consumed_seq = self._seq
+            self._new_frame.notify_all()
+
+    def now(self):
+        """
+        ゲームの時計。ライブ映像なら現在時刻、録画なら最後に渡したフレームの再生位置を返す。
+        録画を速く再生してもゲームの時間の進み方が変わらない。
+        """
+        if self.drop_frames:
+            return time.time()
+        with self._lock:
+            return self._timestamp
+
+    def describe_rate(self):
+        """読み込みの速さ（1秒あたりに grab した枚数とデコードした枚数）"""
+        elapsed = time.time() - self._started_at if self._started_at else 0.0
+        if elapsed <= 0:
+            return "なし"
+        return f"{self._grab_count / elapsed:.1f} fps (デコード {self._seq / elapsed:.1f} fps)"
+
+    def stop(self):
+        """読み込みスレッドを停止し、カメラを解放する"""
+        with self._new_frame:
+            self._running = False
+            self._new_frame.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self.cap.release()
+
+    def release(self):
+        """cv2.VideoCapture と同じ名前で停止できるようにする"""
+        self.stop()
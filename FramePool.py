@@ -0,0 +1,139 @@
+import threading
+import time
+
+import numpy as np
+
+pool_size = 4  # 使い終わったフレームを取っておく枚数
+
+
+class FramePool:
+    """
+    フレームのバッファを使い回す。
+    cap.read() / retrieve() は毎回新しい配列を確保するので、空いているバッファを
+    cap.retrieve(image=...) に渡して、そこに直接書かせる。
+
+    バッファは参照の数で管理する。retain() で使い始め、release() で使い終わったことを伝え、
+    誰も使っていないバッファだけが次の acquire() で使い回される。
+    プールのものではない配列（録画のメモリマップなど）の retain() / release() は何もしない。
+
+        pool = FramePool()
+        buffer = pool.acquire(shape)     # 空いているバッファ（なければ確保する）
+        ret, frame = cap.retrieve(buffer)
+        frame = pool.accept(buffer, frame)  # バッファに書かれていれば使い回しとして数える
+        ...
+        pool.release(frame)              # 使い終わった
+        kept = pool.copy(frame)          # バッファが使い回された後も残したい場合だけコピーする
+
+    size=0 なら使い回さずに毎回確保する（確保の回数を比べるため）。
+    """
+
+    def __init__(self, size=pool_size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._refs = {}  # id(buffer) -> [buffer, 参照の数]
+        self._free = []  # 誰も使っていないバッファ
+        self._recycled = set()  # acquire() で空きから取り出し、accept() を待っているバッファの id
+        self._started_at = time.time()
+        self.allocations = 0  # 新しく確保したフレームの数
+        self.allocated_bytes = 0
+        self.reuses = 0  # 使い回した数
+        self.copies = 0  # copy() でコピーした数
+
+    def acquire(self, shape, dtype=np.uint8):
+        """
+        shape のバッファを1つ取り出す（参照の数は1）。空いていなければ確保する。
+        使い回しの回数は、実際にバッファに書かれたときに accept() で数える。
+        """
+        dtype = np.dtype(dtype)
+        with self._lock:
+            for i, buffer in enumerate(self._free):
+                if buffer.shape == tuple(shape) and buffer.dtype == dtype:
+                    del self._free[i]
+                    self._refs[id(buffer)] = [buffer, 1]
+                    self._recycled.add(id(buffer))
+                    return buffer
+        buffer = np.empty(shape, dtype=dtype)
+        self.adopt(buffer)
+        return buffer
+
+    def accept(self, buffer, frame):
+        """
+        acquire() した buffer を供給元に渡した結果の frame を受け取る。
+        frame が buffer そのものなら使い回しとして数える。供給元が別の配列を返した場合
+        （画像ファイルの読み込みなど、渡したバッファに書かないもの）は、buffer を数えずに空きへ戻し、
+        frame をプールに入れる。
+        """
+        with self._lock:
+            recycled = id(buffer) in self._recycled
+            self._recycled.discard(id(buffer))
+            if frame is buffer:
+                if recycled:
+                    self.reuses += 1
+                return frame
+        self.release(buffer)
+        return self.adopt(frame)
+
+    def adopt(self, frame):
+        """
+        プールの外で確保されたフレーム（cv2 が新しく作った配列など）をプールに入れる（参照の数は1）。
+        メモリマップのビューなど、自分でデータを持たない配列は入れない。
+        """
+        if frame is None or not frame.flags.owndata:
+            return frame
+        with self._lock:
+            self.allocations += 1
+            self.allocated_bytes += frame.nbytes
+            self._refs[id(frame)] = [frame, 1]
+        return frame
+
+    def retain(self, frame):
+        """frame を使い始める（プールのものでなければ何もしない）"""
+        if frame is None:
+            return
+        with self._lock:
+            entry = self._refs.get(id(frame))
+            if entry is not None:
+                entry[1] += 1
+
+    def release(self, frame):
+        """frame を使い終わる。誰も使わなくなったら空きに戻す（size を超える分は捨てる）"""
+        if frame is None:
+            return
+        with self._lock:
+            entry = self._refs.get(id(frame))
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            del self._refs[id(frame)]
+            if len(self._free) < self.size:
+                self._free.append(entry[0])
+
+    def copy(self, frame):
+        """バッファが使い回された後も残すフレームを、明示的にコピーする"""
+        self.copies += 1
+        return frame.copy()
+
+    def in_use(self):
+        """使われているバッファの数"""
+        with self._lock:
+            return len(self._refs)
+
+    def describe(self):
+        """確保・使い回し・コピーの回数と、1秒あたりの確保の回数"""
+        elapsed = time.time() - self._started_at
+        rate = self.allocations / elapsed if elapsed > 0 else 0.0
+        return (f"確保 {self.allocations}回 ({rate:.1f}回/秒, {self.allocated_bytes / 1e6:.1f}MB), "
+                f"使い回し {self.reuses}回, コピー {self.copies}回, 使用中 {self.in_use()}枚")
+
+
+def add_pool_arguments(parser):
+    """argparse にフレームのバッファのオプションを追加する"""
+    parser.add_argument("--frame-pool", type=int, default=pool_size, metavar="N",
+                        help="使い回すフレームのバッファの数（0 で毎フレーム確保する。確保の回数の比較用）")
+
+
+def pool_from_args(args):
+    """コマンドラインの設定からプールを作る"""
+    return FramePool(getattr(args, "frame_pool", pool_size))
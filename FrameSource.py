@@ -0,0 +1,232 @@
+import cv2
+import glob
+import os
+import time
+
+import CaptureConfig as cc  # local unofficial
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class FrameSource:
+    """
+    フレームの供給元の基底クラス。
+    cv2.VideoCapture と同じ read() / isOpened() / release() を持つので、
+    カメラの代わりにそのままゲームループへ渡せる。
+
+    realtime=True の場合は元の FPS に合わせて待ち、False の場合は可能な限り速く返す。
+    last_timestamp には最後に読んだフレームの時刻（秒）が入る。
+    """
+
+    live = False  # カメラのように自分で時間が進むものは True
+    fills_image = False  # retrieve(image) で渡したバッファに書くものは True（書かないものにバッファを渡しても無駄になる）
+
+    def __init__(self, realtime=False, fps=30.0):
+        self.realtime = realtime
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.frame_index = 0  # 次に読むフレームの番号
+        self.last_timestamp = 0.0
+        self._start_wall = None
+
+    def _grab_frame(self):
+        """サブクラスで実装する。次のフレームへ進み、成功したら True を返す（デコードはしない）"""
+        raise NotImplementedError
+
+    def _retrieve_frame(self):
+        """サブクラスで実装する。最後に進んだフレームをデコードして (ret, frame) を返す"""
+        raise NotImplementedError
+
+    def grab(self):
+        """次のフレームへ進む。cv2.VideoCapture.grab() と同じくデコードはしない"""
+        if not self._grab_frame():
+            return False
+        # 再生位置から時刻を決める（実時間に依存しないので何度でも同じ結果になる）
+        self.last_timestamp = self.frame_index / self.fps
+        self.frame_index += 1
+        if self.realtime:
+            self._pace()
+        return True
+
+    def retrieve(self, image=None):
+        """
+        grab() で進んだフレームをデコードして返す。
+        image を渡すとそこに書く（cv2.VideoCapture.retrieve と同じ。書けない供給元は別の配列を返す）
+        """
+        return self._retrieve_frame()
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def _pace(self):
+        """元の FPS に合わせて待つ"""
+        if self._start_wall is None:
+            self._start_wall = time.time() - self.last_timestamp
+        delay = self._start_wall + self.last_timestamp - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        pass
+
+
+class CameraSource(FrameSource):
+    """カメラ（cv2.VideoCapture）からのライブ映像"""
+
+    live = True
+    fills_image = True
+
+    def __init__(self, cap):
+        super().__init__(realtime=True, fps=cap.get(cv2.CAP_PROP_FPS))
+        self.cap = cap
+
+    def grab(self):
+        ret = self.cap.grab()
+        self.last_timestamp = time.time()
+        return ret
+
+    def retrieve(self, image=None):
+        return self.cap.retrieve(image)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource(FrameSource):
+    """動画ファイルからの再生"""
+
+    fills_image = True
+
+    def __init__(self, path, realtime=False):
+        self.cap = cv2.VideoCapture(path)
+        super().__init__(realtime=realtime, fps=self.cap.get(cv2.CAP_PROP_FPS))
+
+    def _grab_frame(self):
+        return self.cap.grab()
+
+    def retrieve(self, image=None):
+        return self.cap.retrieve(image)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageDirSource(FrameSource):
+    """ディレクトリ内の静止画を名前順に1枚ずつ返す"""
+
+    def __init__(self, directory, realtime=False, fps=30.0, loop=False):
+        super().__init__(realtime=realtime, fps=fps)
+        self.paths = sorted(
+            path for path in glob.glob(os.path.join(directory, "*"))
+            if path.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self.loop = loop
+        self._position = 0
+        self._current = None
+
+    def _grab_frame(self):
+        if self._position >= len(self.paths):
+            if not self.loop or not self.paths:
+                return False
+            self._position = 0
+        self._current = self.paths[self._position]
+        self._position += 1
+        return True
+
+    def _retrieve_frame(self):
+        # 読み飛ばしたフレームは画像ファイルを開かない
+        frame = cv2.imread(self._current)
+        return frame is not None, frame
+
+    def isOpened(self):
+        return len(self.paths) > 0
+
+
+class ArraySource(FrameSource):
+    """メモリ上のフレーム列（NumPy配列のリストなど）を返す"""
+
+    fills_image = True
+
+    def __init__(self, frames, realtime=False, fps=30.0, loop=False):
+        super().__init__(realtime=realtime, fps=fps)
+        self.frames = frames
+        self.loop = loop
+        self._position = 0
+        self._current = None
+
+    def _grab_frame(self):
+        if self._position >= len(self.frames):
+            if not self.loop or len(self.frames) == 0:
+                return False
+            self._position = 0
+        self._current = self._position
+        self._position += 1
+        return True
+
+    def _retrieve_frame(self):
+        # ループ側で描画されても元データが変わらないようにコピーを返す
+        return True, self.frames[self._current].copy()
+
+    def retrieve(self, image=None):
+        frame = self.frames[self._current]
+        if image is not None and image.shape == frame.shape and image.dtype == frame.dtype:
+            image[...] = frame  # 渡されたバッファにコピーする（新しく確保しない）
+            return True, image
+        return self._retrieve_frame()
+
+    def isOpened(self):
+        return len(self.frames) > 0
+
+
+def open_source(spec, realtime=False, fps=30.0, loop=False, capture_config=None):
+    """
+    文字列からフレームの供給元を作る。
+    - 数字: カメラのデバイスインデックス（capture_config のモードを要求する）
+    - ディレクトリ: 静止画の連番
+    - .raw ファイル: RawFrames で記録したフレーム（デコード不要）
+    - それ以外: 動画ファイル
+    """
+    if isinstance(spec, int) or str(spec).isdigit():
+        cap = cv2.VideoCapture(int(spec))
+        cc.negotiate(cap, capture_config)
+        return CameraSource(cap)
+    if str(spec).lower().endswith(".raw"):
+        import RawFrames  # local unofficial (RawFrames が FrameSource を使うのでここで読み込む)
+        return RawFrames.RawFrameSource(spec, realtime=realtime, loop=loop)
+    if os.path.isdir(spec):
+        return ImageDirSource(spec, realtime=realtime, fps=fps, loop=loop)
+    return VideoFileSource(spec, realtime=realtime)
+
+
+def add_source_arguments(parser):
+    """argparse にフレーム供給元のオプションを追加する"""
+    parser.add_argument("--source", default=None,
+                        help="カメラ番号、動画ファイル、または静止画ディレクトリ（省略時はカメラを自動検出）")
+    parser.add_argument("--realtime", action="store_true",
+                        help="録画を元のFPSで再生する（省略時は可能な限り速く再生）")
+    parser.add_argument("--fps", type=float, default=30.0,
+                        help="静止画ディレクトリを再生するときのFPS")
+    parser.add_argument("--loop", action="store_true",
+                        help="静止画ディレクトリや raw ファイルを繰り返し再生する")
+    parser.add_argument("--preview-fps", type=float, default=None,
+                        help="カウントダウン中のプレビューのFPS（省略時はカメラのFPSのまま）。"
+                             "間のフレームは grab() だけしてデコードしない")
+
+
+def source_from_args(args):
+    """add_source_arguments で追加したオプションから供給元を作る。指定がなければ None"""
+    if args.source is None:
+        return None
+    capture_config = cc.config_from_args(args) if hasattr(args, "capture_width") else None
+    return open_source(args.source, realtime=args.realtime, fps=args.fps, loop=args.loop,
+                       capture_config=capture_config)
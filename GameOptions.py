@@ -0,0 +1,23 @@
+import argparse
+
+import CaptureConfig as cc  # local unofficial
+import DisplaySink as ds  # local unofficial
+import FrameSource as fs  # local unofficial
+import FramePool as fp  # local unofficial
+import ModelManager as mm  # local unofficial
+
+
+def build_parser(description="Object Detection Game"):
+    """各ゲームで共通のコマンドラインオプションを持つパーサーを作る"""
+    parser = argparse.ArgumentParser(description=description)
+    fs.add_source_arguments(parser)
+    cc.add_capture_arguments(parser)
+    mm.add_model_arguments(parser)
+    ds.add_display_arguments(parser)
+    fp.add_pool_arguments(parser)
+    return parser
+
+
+def parse_args(argv=None):
+    """コマンドラインを解析する。argv=[] なら既定の設定を返す"""
+    return build_parser().parse_args(argv)
@@ -0,0 +1,166 @@
+import argparse
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+max_entries = 256  # キャッシュしておく文字列の数（古いものから捨てる）
+
+
+max_colors = 8  # 1つの文字列について、塗った色の画像を取っておく数
+
+
+class TextSprite:
+    """
+    一度だけ描いておいた文字列のマスク。org（putText の左下の基準点）からの位置を持つ。
+    マスクはチャンネル分まで広げておき、色ごとに塗った画像も取っておくので、
+    描くときは np.copyto(..., where=mask) の1回だけで済む（毎回マスクを作ったり、画素を集めたりしない）。
+    """
+
+    __slots__ = ("mask", "dx", "dy", "_tiles")
+
+    def __init__(self, mask, dx, dy):
+        self.mask = mask  # 文字の部分が True の (h, w) の配列
+        self.dx = dx  # org からマスクの左上までのずれ
+        self.dy = dy
+        self._tiles = {}  # (色, チャンネル数) -> (その色で塗った画像, チャンネル分のマスク)
+
+    def tile(self, color, channels):
+        """color で塗った (h, w, channels) の画像と、同じ形のマスク"""
+        key = (color if isinstance(color, tuple) else tuple(color), channels)
+        tile = self._tiles.get(key)
+        if tile is None:
+            if len(self._tiles) >= max_colors:
+                self._tiles.clear()
+            height, width = self.mask.shape
+            image = np.empty((height, width, channels), dtype=np.uint8)
+            image[:] = [int(c) for c in color][:channels]
+            tile = self._tiles[key] = (image, np.repeat(self.mask[:, :, None], channels, axis=2))
+        return tile
+
+
+def render_sprite(text, font, scale, thickness):
+    """文字列を白黒のマスクに描き、文字のある範囲だけを切り出す"""
+    (width, height), baseline = cv2.getTextSize(text, font, scale, thickness)
+    pad = thickness + 2  # 線の太さの分だけはみ出すので余白をとる
+    canvas = np.zeros((height + baseline + pad * 2, width + pad * 2), dtype=np.uint8)
+    org = (pad, pad + height)
+    # アンチエイリアスなし (LINE_8) で描く。LINE_8 が2値になる OpenCV (4.x) では、
+    # フレームに LINE_8 で直接描いたときと同じ画素になる（既定の線の種類は版によって違うので明示する）
+    cv2.putText(canvas, text, org, font, scale, 255, thickness, cv2.LINE_8)
+    ys, xs = np.nonzero(canvas)
+    if len(ys) == 0:
+        return TextSprite(np.zeros((0, 0), dtype=bool), 0, 0)
+    y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+    return TextSprite(canvas[y0:y1, x0:x1] > 0, int(x0 - org[0]), int(y0 - org[1]))
+
+
+class GlyphCache:
+    """
+    カウントダウンの数字やラベルのように何度も出る文字列を、マスクにしてキャッシュする。
+    2回目以降は putText で描き直さず、色を塗っておいた画像をマスクの部分だけフレームにコピーする。
+    putText より速いことは benchmark() と test_GlyphCache.py で確かめる。
+
+        glyphs = GlyphCache()
+        glyphs.put_text(frame, "3", (x, y), cv2.FONT_HERSHEY_SIMPLEX, 3, (0, 0, 255), 5)
+    """
+
+    def __init__(self, capacity=max_entries):
+        self.capacity = capacity
+        self._sprites = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def sprite(self, text, font, scale, thickness):
+        key = (text, font, scale, thickness)
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            self.misses += 1
+            sprite = render_sprite(text, font, scale, thickness)
+            self._sprites[key] = sprite
+            if len(self._sprites) > self.capacity:
+                self._sprites.popitem(last=False)
+        else:
+            self.hits += 1
+            self._sprites.move_to_end(key)
+        return sprite
+
+    def put_text(self, frame, text, org, font, scale, color, thickness=1):
+        """cv2.putText(..., lineType=cv2.LINE_8) と同じ引数で、キャッシュしたマスクを使って描く（BGR のフレーム）"""
+        sprite = self.sprite(text, font, scale, thickness)
+        height, width = sprite.mask.shape
+        x0, y0 = org[0] + sprite.dx, org[1] + sprite.dy
+        # フレームからはみ出す部分は切り取る
+        left, top = max(-x0, 0), max(-y0, 0)
+        right = min(width, frame.shape[1] - x0)
+        bottom = min(height, frame.shape[0] - y0)
+        if left >= right or top >= bottom:
+            return frame
+        image, mask = sprite.tile(color, frame.shape[2])
+        if left or top or right < width or bottom < height:
+            image, mask = image[top:bottom, left:right], mask[top:bottom, left:right]
+        np.copyto(frame[y0 + top:y0 + bottom, x0 + left:x0 + right], image, where=mask)
+        return frame
+
+
+# ゲームで共通に使うキャッシュ
+default_cache = GlyphCache()
+
+
+def put_text(frame, text, org, font, scale, color, thickness=1):
+    """default_cache を使って cv2.putText の代わりに描く"""
+    return default_cache.put_text(frame, text, org, font, scale, color, thickness)
+
+
+def _time_per_call(draw, runs, repeats):
+    """draw(i) を runs 回呼ぶのを repeats 回くり返し、一番速かった回の1回あたりの時間を返す"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for i in range(runs):
+            draw(i)
+        best = min(best, (time.perf_counter() - start) / runs)
+    return best
+
+
+def benchmark(runs=1000, shape=(480, 640, 3), repeats=5):
+    """
+    カウントダウンの数字とラベルを描く時間を、putText とキャッシュで比べる。
+    （ゲームでキャッシュを使うのはラベルだけ。カウントダウンは putText の方が速いことを確かめるために測る）
+    戻り値: {名前: (putText の1回あたりの時間, キャッシュの1回あたりの時間, 画素が一致したか)}
+    """
+    cases = {
+        "countdown": ([str(i) for i in range(1, 6)], (shape[1] // 2 - 50, shape[0] // 2), 3, (0, 0, 255), 5),
+        # RevealAnimator が出すラベルと同じ文字列・大きさ
+        "label": ([f"{label} ({total:03}pts)" for label in ("kinoko", "takenoko") for total in range(-30, 120, 30)],
+                  (100, 100), 0.5, (0, 255, 0), 2),
+    }
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    cache = GlyphCache()
+    base = np.full(shape, 64, dtype=np.uint8)
+    summary = {}
+    for name, (texts, org, scale, color, thickness) in cases.items():
+        frame = base.copy()
+        direct = _time_per_call(
+            lambda i: cv2.putText(frame, texts[i % len(texts)], org, font, scale, color, thickness, cv2.LINE_8),
+            runs, repeats)
+        cached = _time_per_call(
+            lambda i: cache.put_text(frame, texts[i % len(texts)], org, font, scale, color, thickness), runs, repeats)
+
+        same = all(
+            np.array_equal(cv2.putText(base.copy(), text, org, font, scale, color, thickness, cv2.LINE_8),
+                           cache.put_text(base.copy(), text, org, font, scale, color, thickness))
+            for text in texts)
+        summary[name] = (direct, cached, same)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="文字列の描画を putText とキャッシュで比べる")
+    parser.add_argument("--runs", type=int, default=1000)
+    args = parser.parse_args()
+    print(f"{'文字列':<12}{'putText(us)':>14}{'キャッシュ(us)':>16}{'速度比':>8}  画素")
+    for name, (direct, cached, same) in benchmark(args.runs).items():
+        print(f"{name:<12}{direct * 1e6:>14.1f}{cached * 1e6:>16.1f}{direct / cached if cached else 0.0:>8.2f}"
+              f"  {'一致' if same else '不一致'}")
@@ -0,0 +1,309 @@
+import multiprocessing
+import queue
+import signal
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import ModelManager as mm  # local unofficial
+
+ring_slots = 3  # 共有メモリに用意しておくフレームの枠の数（推論待ちにできる最大の枚数）
+poll_interval = 0.5  # 結果を待つ間に、推論プロセスが生きているかを確かめる間隔 (秒)
+
+
+class FrameRing:
+    """
+    同じ大きさのフレームを slots 枚置ける共有メモリ。
+    作った側 (create=True) が close() で解放し、推論プロセスは名前で開いて使う。
+    NumPy 配列は共有メモリの上に直接作るので、フレームを pickle して送らない。
+    """
+
+    def __init__(self, shape, slots=ring_slots, dtype=np.uint8, name=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.dtype = np.dtype(dtype)
+        self.owner = name is None
+        size = slots * int(np.prod(self.shape)) * self.dtype.itemsize
+        if self.owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._shm = _attach(name)
+        self.name = self._shm.name
+        self._frames = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=self._shm.buf)
+
+    def describe(self):
+        """推論プロセスで同じ共有メモリを開くための情報"""
+        return self.name, self.shape, self.slots, self.dtype.str
+
+    def frame(self, slot):
+        """枠のフレーム（コピーしない）"""
+        return self._frames[slot]
+
+    def write(self, slot, frame):
+        np.copyto(self._frames[slot], frame)
+
+    def close(self):
+        self._frames = None  # 共有メモリを閉じる前に配列の参照を外す
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+
+def _attach(name):
+    """
+    作った側の共有メモリを開く。解放は作った側だけが行うので、resource tracker には登録しない
+    （登録すると、終了時に「解放されていない共有メモリ」の警告や二重の unlink が起きる）
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # track が使えない Python 3.12 以前はそのまま開く。spawn したプロセスは親と同じ resource tracker を
+        # 使うので、ここで登録を取り消すと親の登録まで消えてしまう（親の unlink で登録は消える）
+        return shared_memory.SharedMemory(name=name)
+
+
+def _worker_main(weights, backend, threads, requests, results):
+    """
+    推論プロセスの本体。モデルはこのプロセスの中で読み込む。
+    requests から受け取るもの:
+      ("ring", name, shape, slots, dtype)  共有メモリを開く
+      ("warmup", shape, runs)              空推論
+      ("detect", seq, slot)                枠のフレームを推論する
+      None                                 終わる
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C では止めず、親の close() で止める
+    ring = None
+    try:
+        model = mm.ModelManager(weights, backend, threads)
+        results.put(("ready", dict(model.names)))
+        while True:
+            message = requests.get()
+            if message is None:
+                break
+            kind = message[0]
+            if kind == "ring":
+                if ring is not None:
+                    ring.close()
+                name, shape, slots, dtype = message[1:]
+                ring = FrameRing(shape, slots, dtype, name=name)
+            elif kind == "warmup":
+                model.warmup(message[1], message[2])
+                results.put(("warmup", model.warmup_latency))
+            elif kind == "detect":
+                _, seq, slot = message
+                start = time.perf_counter()
+                records = model.detect_records(ring.frame(slot))
+                # 返すのは検出結果の構造化配列だけ（1件あたり dtype のサイズ）
+                results.put(("result", seq, slot, records, time.perf_counter() - start))
+    except Exception as e:
+        results.put(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        if ring is not None:
+            ring.close()
+
+
+class InferenceWorker:
+    """
+    YOLOモデルを別のプロセスで動かす。ModelManager と同じ使い方ができる。
+    フレームは共有メモリの枠 (FrameRing) に書いて枠の番号だけを送り、検出結果の構造化配列を受け取る。
+    推論中は GIL も torch のスレッドも別のプロセスにあるので、カメラの読み込みや表示のスレッドと取り合わない。
+
+        model = InferenceWorker("best.pt")
+        model.load_async()  # 推論プロセスを起動し、そこでモデルを読み込む
+        objects = model.detect_records(frame)  # ModelManager と同じ
+        seq = model.submit(frame, block=False)  # 待たずに送る（枠が空いていなければ None）
+        for seq, objects in model.poll(): ...  # 終わった推論の結果
+        model.close()
+
+    空いている枠がなくなると、submit() は推論が終わるまで待つ (block=True) か、フレームを捨てる。
+    """
+
+    def __init__(self, weights="best.pt", backend="pytorch", threads=None, slots=ring_slots, start_method="spawn"):
+        self.weights = weights
+        self.backend = backend
+        self.threads = threads
+        self.slots = slots
+        # 表示のスレッドなどが動いている状態で fork すると、torch の初期化で固まることがあるので spawn にする
+        self.context = multiprocessing.get_context(start_method)
+        self._requests = None
+        self._results = None
+        self._process = None
+        self._ring = None
+        self._free = []  # 空いている枠の番号
+        self._sent = {}  # seq -> 送った時刻
+        self._done = {}  # seq -> 受け取ったがまだ取り出されていない検出結果
+        self._seq = 0
+        self._names = None
+        self._warmed = False
+        self.dropped = 0  # 枠が空いていなくて捨てたフレームの数
+        self.warmup_latency = mm.LatencyStats()  # 空推論の時間（推論プロセスで測ったもの）
+        self.latency = mm.LatencyStats()  # 推論プロセスの中の推論時間
+        self.round_trip = mm.LatencyStats()  # 送ってから結果を受け取るまでの時間
+
+    def load_async(self, backend=None, threads=None):
+        """推論プロセスを起動する。モデルの読み込みはそのプロセスで行われ、ここでは待たない"""
+        if self._process is not None:
+            return self
+        self.backend = backend or self.backend
+        self.threads = threads if threads is not None else self.threads
+        self._requests = self.context.Queue()
+        self._results = self.context.Queue()
+        self._process = self.context.Process(
+            target=_worker_main, name="InferenceWorker", daemon=True,
+            args=(self.weights, self.backend, self.threads, self._requests, self._results))
+        self._process.start()
+        return self
+
+    def get(self):
+        """モデルの読み込みが終わるまで待つ"""
+        self.load_async()
+        while self._names is None:
+            self._receive()
+        return self
+
+    @property
+    def names(self):
+        """クラスIDとラベル名の対応（推論プロセスから受け取ったもの）"""
+        return self.get()._names
+
+    def _receive(self, timeout=None):
+        """推論プロセスからの知らせを1つ受け取って処理する。timeout までに来なければ False"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            wait = poll_interval if deadline is None else min(poll_interval, deadline - time.perf_counter())
+            try:
+                message = self._results.get(timeout=max(wait, 0.0))
+                break
+            except queue.Empty:
+                if not self._process.is_alive():
+                    raise RuntimeError("推論プロセスが終了しました")
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return False
+        kind = message[0]
+        if kind == "ready":
+            self._names = message[1]
+        elif kind == "warmup":
+            self.warmup_latency = message[1]
+            self._warmed = True
+        elif kind == "result":
+            _, seq, slot, records, seconds = message
+            self._free.append(slot)  # 推論プロセスが読み終わったので枠を空ける
+            self._done[seq] = records
+            self.latency.add(seconds)
+            self.round_trip.add(time.perf_counter() - self._sent.pop(seq))
+        elif kind == "error":
+            raise RuntimeError(f"推論プロセスでエラーが発生しました: {message[1]}")
+        return True
+
+    def _ensure_ring(self, shape):
+        """最初のフレームの大きさで共有メモリを用意し、推論プロセスに開かせる"""
+        if self._ring is not None:
+            if self._ring.shape != tuple(shape):
+                raise ValueError(f"フレームの大きさが変わりました: {self._ring.shape} -> {tuple(shape)}")
+            return
+        self._ring = FrameRing(shape, self.slots)
+        self._free = list(range(self.slots))
+        self._requests.put(("ring",) + self._ring.describe())
+
+    def warmup(self, shape, runs=mm.warmup_runs):
+        """推論プロセスで空推論を行い、終わるまで待つ"""
+        self.get()
+        self._ensure_ring(shape)
+        self._warmed = False
+        self._requests.put(("warmup", tuple(shape), runs))
+        while not self._warmed:
+            self._receive()
+
+    def submit(self, frame, block=True):
+        """
+        フレームを空いている枠に書いて推論を頼み、番号 (seq) を返す。
+        枠が空いていない場合、block=True なら空くまで待ち、False ならフレームを捨てて None を返す。
+        """
+        self.load_async()
+        self._ensure_ring(frame.shape)
+        while not self._free:
+            if not block:
+                self.dropped += 1
+                return None
+            self._receive()
+        slot = self._free.pop()
+        self._ring.write(slot, frame)
+        self._seq += 1
+        self._sent[self._seq] = time.perf_counter()
+        self._requests.put(("detect", self._seq, slot))
+        return self._seq
+
+    def wait(self, seq, timeout=None):
+        """seq の推論が終わるまで待ち、検出結果を返す。timeout までに終わらなければ None"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while seq not in self._done:
+            remaining = None if deadline is None else deadline - time.perf_counter()
+            if remaining is not None and remaining <= 0:
+                return None
+            self._receive(remaining)
+        return self._done.pop(seq)
+
+    def poll(self):
+        """待たずに、終わった推論の (seq, 検出結果) をすべて返す"""
+        while self._receive(timeout=0):
+            pass
+        done, self._done = sorted(self._done.items()), {}
+        return done
+
+    def drain(self):
+        """推論を頼んだ分がすべて終わるまで待ち、(seq, 検出結果) を返す"""
+        while self._sent:
+            self._receive()
+        return self.poll()
+
+    def pending(self):
+        """推論を頼んで、まだ結果を受け取っていない数"""
+        return len(self._sent)
+
+    def detect_records(self, frame):
+        """推論して検出結果を構造化配列 (ScoreRecords.DETECTION_DTYPE) で返す（ModelManager と同じ）"""
+        return self.wait(self.submit(frame))
+
+    def print_latency_report(self):
+        """空推論・推論プロセスでの推論・受け渡しを含めた往復の時間を表示する"""
+        print(f"推論時間 (ウォームアップ): {self.warmup_latency.describe()}")
+        print(f"推論時間 (ゲーム中): {self.latency.describe()}")
+        print(f"推論の往復 (共有メモリへの書き込みと受け渡しを含む): {self.round_trip.describe()}")
+        if self.dropped:
+            print(f"枠が空かずに捨てたフレーム: {self.dropped}枚")
+
+    def close(self, timeout=5.0):
+        """推論プロセスに終わりを伝えて待ち、共有メモリを解放する"""
+        if self._process is not None:
+            try:
+                self._requests.put(None)
+                self._process.join(timeout)
+            finally:
+                if self._process.is_alive():
+                    self._process.terminate()
+                    self._process.join()
+                self._process = None
+                # 読まれていない結果があってもキューのスレッドを待たずに閉じる
+                for q in (self._requests, self._results):
+                    q.cancel_join_thread()
+                    q.close()
+        if self._ring is not None:
+            self._ring.close()
+            self._ring = None
+        self._free = []
+        self._sent.clear()
+
+    def __enter__(self):
+        return self.load_async()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def add_worker_arguments(parser):
+    """argparse に推論プロセスのオプションを追加する"""
+    parser.add_argument("--inference-worker", action="store_true",
+                        help="推論を別のプロセスで行う（フレームは共有メモリで渡す）")
+    parser.add_argument("--ring-slots", type=int, default=ring_slots,
+                        help="推論プロセスに渡すフレームの枠の数（推論待ちにできる最大の枚数）")
@@ -0,0 +1,152 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+import Detector as dt  # local unofficial
+
+warmup_runs = 3  # ゲーム開始前に行う空推論の回数
+
+
+class LatencyStats:
+    """推論時間の回数・合計・最小・最大だけを保持する（すべての値は保存しない）"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def describe(self):
+        if not self.count:
+            return "なし"
+        return (f"{self.count}回, 平均 {self.mean * 1000:.1f}ms, "
+                f"最小 {self.min * 1000:.1f}ms, 最大 {self.max * 1000:.1f}ms")
+
+
+class ModelManager:
+    """
+    YOLOモデルを必要になるまで読み込まない、または裏のスレッドで読み込むための管理クラス。
+    モジュールを import しただけでは torch / ultralytics も重みも読み込まれない。
+
+        model = ModelManager("best.pt")
+        model.load_async()   # カメラを開いている間に裏で読み込む
+        ...
+        model.warmup(frame.shape)  # 最初の採点が遅くならないように空推論しておく
+        objects = model.detect(frame)  # 読み込みが終わっていなければここで待つ
+
+    backend で推論ランタイムを選べる（pytorch / torchscript / onnx など、Detector 参照）。
+    """
+
+    def __init__(self, weights="best.pt", backend="pytorch", threads=None):
+        self.weights = weights
+        self.backend = backend
+        self.threads = threads  # 推論のスレッド数（None ならランタイムの既定値）
+        self._future = None
+        self._lock = threading.Lock()
+        self.warmup_latency = LatencyStats()  # 空推論の時間
+        self.latency = LatencyStats()  # ゲーム中の推論の時間
+
+    def _load(self):
+        return dt.create_detector(self.backend, self.weights, threads=self.threads)
+
+    def load_async(self, backend=None, threads=None):
+        """
+        裏のスレッドで読み込みを始める。すでに始まっていれば何もしない。
+        backend / threads を指定すると、読み込み前であれば設定を変更する。
+        """
+        with self._lock:
+            if self._future is None:
+                if backend is not None:
+                    self.backend = backend
+                if threads is not None:
+                    self.threads = threads
+                self._future = Future()
+                threading.Thread(target=self._run, args=(self._future,), name="ModelLoader", daemon=True).start()
+        return self
+
+    def _run(self, future):
+        try:
+            future.set_result(self._load())
+        except BaseException as e:
+            future.set_exception(e)
+
+    def ready(self):
+        """読み込み完了を表す Future を返す（読み込みが始まっていなければ始める）"""
+        self.load_async()
+        return self._future
+
+    def is_ready(self):
+        """読み込みが終わっていれば True"""
+        return self._future is not None and self._future.done()
+
+    def get(self, timeout=None):
+        """モデルを返す。読み込みが終わっていなければ終わるまで待つ"""
+        return self.ready().result(timeout)
+
+    @property
+    def names(self):
+        """クラスIDとラベル名の対応"""
+        return self.get().names
+
+    def detect(self, frame):
+        """推論して (label, confidence, area, bbox) のリストを返す。かかった時間を記録する"""
+        detector = self.get()
+        start = time.perf_counter()
+        objects = detector.detect(frame)
+        self.latency.add(time.perf_counter() - start)
+        return objects
+
+    def detect_records(self, frame):
+        """推論して検出結果を構造化配列 (ScoreRecords.DETECTION_DTYPE) で返す。かかった時間を記録する"""
+        detector = self.get()
+        start = time.perf_counter()
+        records = detector.detect_records(frame)
+        self.latency.add(time.perf_counter() - start)
+        return records
+
+    def plot(self, frame):
+        """推論して検出結果を描画したフレームを返す。かかった時間を記録する"""
+        detector = self.get()
+        start = time.perf_counter()
+        annotated = detector.plot(frame)
+        self.latency.add(time.perf_counter() - start)
+        return annotated
+
+    def warmup(self, shape, runs=warmup_runs):
+        """
+        実際の入力と同じ大きさの黒画像で空推論を行う。
+        初回の推論で発生する準備処理（予測器の作成やメモリ確保）をゲーム開始前に済ませる。
+        """
+        detector = self.get()
+        dummy = np.zeros(shape, dtype=np.uint8)
+        for _ in range(runs):
+            start = time.perf_counter()
+            detector.detect(dummy)
+            self.warmup_latency.add(time.perf_counter() - start)
+
+    def print_latency_report(self):
+        """空推論とゲーム中の推論時間を表示する"""
+        print(f"推論時間 (ウォームアップ): {self.warmup_latency.describe()}")
+        print(f"推論時間 (ゲーム中): {self.latency.describe()}")
+
+
+def add_model_arguments(parser):
+    """argparse にモデルのオプションを追加する"""
+    parser.add_argument("--warmup-runs", type=int, default=warmup_runs,
+                        help="ゲーム開始前に行う空推論の回数（0 で行わない）")
+    parser.add_argument("--backend", choices=dt.backend_names(), default="pytorch",
+                        help="推論に使うランタイム（pytorch 以外は初回に best.pt を書き出してキャッシュする）")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="推論の intra-op スレッド数（省略時はランタイムの既定値、ONNX は物理コア数）")
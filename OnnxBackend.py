@@ -0,0 +1,116 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+import Detector as dt  # local unofficial
+
+imgsz = dt.imgsz  # モデルの入力サイズ
+conf_threshold = 0.25  # ultralytics の既定値と同じ
+iou_threshold = 0.7  # ultralytics の既定値と同じ
+max_det = 300
+
+
+def export_onnx(weights, size=imgsz, cache_dir=dt.CACHE_DIR):
+    """
+    .pt を ONNX に書き出してキャッシュする。重みが同じなら2回目以降は書き出さない。
+    戻り値: (onnxのパス, クラス名の辞書)
+    """
+    onnx_path = dt.export_cached(weights, "onnx", ".onnx", size, cache_dir)
+    names_path = os.path.splitext(onnx_path)[0] + ".json"
+    if not os.path.exists(names_path):
+        from ultralytics import YOLO  # クラス名を取り出すときだけ必要
+        with open(names_path, "w", encoding="utf-8") as f:
+            json.dump({str(k): v for k, v in YOLO(weights).names.items()}, f, ensure_ascii=False)
+    with open(names_path, "r", encoding="utf-8") as f:
+        names = {int(k): v for k, v in json.load(f).items()}
+    return onnx_path, names
+
+
+def default_threads():
+    """推論に使うスレッド数（物理コア数）"""
+    try:
+        import psutil
+        return psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    except ImportError:
+        return os.cpu_count() or 1
+
+
+def letterbox(frame, size=imgsz, color=(114, 114, 114)):
+    """縦横比を保ったまま size x size に収め、余白を埋める。(画像, 倍率, (左余白, 上余白)) を返す"""
+    height, width = frame.shape[:2]
+    gain = min(size / height, size / width)
+    new_w, new_h = int(round(width * gain)), int(round(height * gain))
+    pad_x, pad_y = (size - new_w) / 2, (size - new_h) / 2
+    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    boxed = cv2.copyMakeBorder(resized, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return boxed, gain, (left, top)
+
+
+class OnnxDetector(dt.Detector):
+    """
+    ONNX Runtime (CPU) で YOLOv8 の推論を行う。
+    detect() は DetectGame の detect_objects と同じ (label, confidence, area, bbox) のリストを返す。
+    model_path を指定すると、best.pt を書き出したものの代わりにそのモデル（INT8 版など）を使う。
+    """
+
+    def __init__(self, weights="best.pt", size=imgsz, threads=None, model_path=None):
+        import onnxruntime as ort  # ONNX を使うときだけ必要
+        self.size = size
+        onnx_path, self.names = export_onnx(weights, size)
+        onnx_path = model_path or onnx_path
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads or default_threads()
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def preprocess(self, frame):
+        """BGR画像をモデルの入力 (1, 3, size, size) float32 に変換する"""
+        boxed, gain, pad = letterbox(frame, self.size)
+        blob = cv2.dnn.blobFromImage(boxed, scalefactor=1 / 255.0, swapRB=True)
+        return blob, gain, pad
+
+    def postprocess(self, output, gain, pad, shape):
+        """
+        出力 (1, 4+クラス数, 候補数) を NMS して元画像の座標に戻す。
+        戻り値: (N, 6) の配列 [x1, y1, x2, y2, confidence, class_id]
+        """
+        predictions = output[0].T  # (候補数, 4+クラス数)
+        scores = predictions[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+        keep = confidences >= conf_threshold
+        predictions, class_ids, confidences = predictions[keep], class_ids[keep], confidences[keep]
+        if len(predictions) == 0:
+            return np.zeros((0, 6), dtype=np.float32)
+
+        # 中心座標と幅・高さ -> 左上・右下
+        cx, cy, w, h = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+        # クラスごとの NMS（ultralytics と同じく agnostic ではない）
+        indices = cv2.dnn.NMSBoxesBatched(
+            np.stack([boxes[:, 0], boxes[:, 1], w, h], axis=1).tolist(),
+            confidences.tolist(), class_ids.tolist(), conf_threshold, iou_threshold)
+        indices = np.array(indices, dtype=np.int64).reshape(-1)
+        indices = indices[np.argsort(-confidences[indices])][:max_det]
+        boxes, confidences, class_ids = boxes[indices], confidences[indices], class_ids[indices]
+
+        # 余白と倍率を元に戻す
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / gain
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / gain
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, shape[1])
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, shape[0])
+        return np.concatenate([boxes, confidences[:, None], class_ids[:, None]], axis=1).astype(np.float32)
+
+    def infer(self, frame):
+        """推論して (N, 6) の検出結果を返す"""
+        blob, gain, pad = self.preprocess(frame)
+        output = self.session.run(None, {self.input_name: blob})[0]
+        return self.postprocess(output, gain, pad, frame.shape)
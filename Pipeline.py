@@ -0,0 +1,331 @@
+import multiprocessing
+import queue
+import threading
+import time
+from collections import deque
+
+# 辺（ステージの間のキュー）があふれたときの扱い
+DROP_OLDEST = "drop-oldest"  # 一番古いものを捨てて入れる（遅れても最新に追いつく）
+BLOCK = "block"  # 空くまで上流を待たせる（1つも捨てない）
+LATEST_ONLY = "latest-only"  # 最新の1つだけを持つ（遅延が一番小さい）
+POLICIES = (DROP_OLDEST, BLOCK, LATEST_ONLY)
+
+# ステージを動かす場所
+THREAD = "thread"
+PROCESS = "process"
+PLACEMENTS = (THREAD, PROCESS)
+
+STOP = "__pipeline_stop__"  # 終わりを下流に伝える印（プロセス間でも比べられるように文字列にする）
+stop_grace = 2.0  # stop() の後、プロセスのステージが自分で終わるのを待つ時間 (秒)
+
+
+class ThreadEdge:
+    """同じプロセスのステージの間の、上限つきのキュー"""
+
+    def __init__(self, maxsize=2, policy=DROP_OLDEST):
+        if policy not in POLICIES:
+            raise ValueError(f"未知のポリシーです: {policy}")
+        self.maxsize = 1 if policy == LATEST_ONLY else max(1, maxsize)
+        self.policy = policy
+        self.when = None  # 上流の結果のうち、この辺に流すものを選ぶ関数（None ならすべて）
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.passed = 0
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self.policy == BLOCK:
+                self._cond.wait_for(lambda: len(self._items) < self.maxsize or self._closed)
+            if self._closed:
+                return  # 下流がもう終わっている
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self.passed += 1
+            self._cond.notify_all()
+
+    def put_stop(self):
+        """終わりの印は捨てられないように、上限を無視して入れる"""
+        with self._cond:
+            self._items.append(STOP)
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                raise queue.Empty
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        """下流のステージが終わったときに呼ぶ。待っている上流を起こす"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def abandon(self):
+        """途中で止めたときに呼ぶ。同じプロセスのキューなので何もしなくてよい"""
+
+
+class ProcessEdge:
+    """別のプロセスのステージとつなぐ、上限つきのキュー (multiprocessing.Queue)"""
+
+    def __init__(self, context, maxsize=2, policy=DROP_OLDEST):
+        if policy not in POLICIES:
+            raise ValueError(f"未知のポリシーです: {policy}")
+        self.maxsize = 1 if policy == LATEST_ONLY else max(1, maxsize)
+        self.policy = policy
+        self.when = None
+        self._queue = context.Queue(self.maxsize)
+        self._passed = context.Value("q", 0)
+        self._dropped = context.Value("q", 0)
+        self._closed = context.Value("b", 0)
+
+    @property
+    def passed(self):
+        return self._passed.value
+
+    @property
+    def dropped(self):
+        return self._dropped.value
+
+    def put(self, item):
+        while not self._closed.value:
+            try:
+                if self.policy == BLOCK:
+                    self._queue.put(item, timeout=0.1)
+                else:
+                    self._queue.put_nowait(item)
+                break
+            except queue.Full:
+                if self.policy == BLOCK:
+                    continue
+                try:
+                    self._queue.get_nowait()
+                    with self._dropped.get_lock():
+                        self._dropped.value += 1
+                except queue.Empty:
+                    pass
+        else:
+            return  # 下流がもう終わっている
+        with self._passed.get_lock():
+            self._passed.value += 1
+
+    def put_stop(self):
+        while not self._closed.value:
+            try:
+                self._queue.put(STOP, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def get(self, timeout=None):
+        return self._queue.get(timeout=timeout)
+
+    def close(self):
+        self._closed.value = 1
+
+    def abandon(self):
+        """
+        途中で止めたときに呼ぶ。読まれずに残ったフレームをパイプに書き切るまで
+        プロセスの終了を待たないようにする（大きなフレームがパイプに入りきらず終われなくなるのを防ぐ）
+        """
+        self._queue.cancel_join_thread()
+
+
+class Stage:
+    """
+    パイプラインの1段。func(item) の戻り値を下流のすべての辺に渡す（None なら何も渡さない）。
+    source のステージは func() を呼び続け、StopIteration で終わる。
+    プロセスで動かす場合、func は pickle できるもの（モジュールの関数や、__call__ を持つクラスのインスタンス）にする。
+    （spawn で起動するので、プロセスの中ではモジュールを読み込み直した状態から始まる）
+    """
+
+    def __init__(self, name, func, placement=THREAD, source=False, context=None):
+        if placement not in PLACEMENTS:
+            raise ValueError(f"未知の配置です: {placement}")
+        self.name = name
+        self.func = func
+        self.placement = placement
+        self.source = source
+        self.input = None
+        self.outputs = []
+        self._processed = (context or multiprocessing).Value("q", 0)
+        self._busy = (context or multiprocessing).Value("d", 0.0)
+        self._worker = None
+
+    @property
+    def processed(self):
+        return self._processed.value
+
+    @property
+    def busy(self):
+        """func の中にいた時間の合計 (秒)"""
+        return self._busy.value
+
+
+def _run_stage(func, source, input_edge, outputs, processed, busy, stop_event):
+    """
+    ステージの本体（スレッドでもプロセスでも同じ）。
+    プロセスに渡せるように Stage そのものではなく必要なものだけを受け取る。
+    """
+    try:
+        while not stop_event.is_set():
+            if source:
+                item = None
+            else:
+                try:
+                    item = input_edge.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if isinstance(item, str) and item == STOP:
+                    break
+            start = time.perf_counter()
+            try:
+                result = func() if source else func(item)
+            except StopIteration:
+                break
+            with busy.get_lock():
+                busy.value += time.perf_counter() - start
+            with processed.get_lock():
+                processed.value += 1
+            if result is not None:
+                for edge in outputs:
+                    if edge.when is None or edge.when(result):
+                        edge.put(result)
+    finally:
+        if input_edge is not None:
+            input_edge.close()
+        for edge in outputs:
+            edge.put_stop()
+        if stop_event.is_set():
+            # 途中で止めた場合、キューに残ったものは捨てる
+            for edge in ([input_edge] if input_edge is not None else []) + outputs:
+                edge.abandon()
+
+
+class Pipeline:
+    """
+    ステージをキューでつないだ処理の流れ。どのステージをスレッド/プロセスで動かすか、
+    ステージの間のキューをどれだけ持ちどうあふれさせるかを、組み立てるときに宣言する。
+
+        pipe = Pipeline()
+        pipe.add_source("capture", capture)
+        pipe.add_stage("detect", detect, policy=LATEST_ONLY, placement=PROCESS)
+        pipe.add_stage("score", score, policy=BLOCK)
+        pipe.add_stage("render", render, policy=LATEST_ONLY)
+        pipe.add_stage("sound", play, after="score", policy=DROP_OLDEST, maxsize=4)
+        pipe.run()  # source が終わるか stop() が呼ばれるまで待つ
+    """
+
+    def __init__(self, start_method="spawn"):
+        # プロセスのステージを起動する時には、モデルの読み込みやカメラのスレッドがもう動いている。
+        # スレッドの途中の状態 (torch / OpenMP のロックなど) を fork で引き継ぐと固まるので、既定は spawn にする
+        self.context = multiprocessing.get_context(start_method)
+        self.stages = {}
+        self._last = None
+        self._stop_event = self.context.Event()
+        self._started_at = None
+        self._finished_at = None
+
+    def add_source(self, name, func, placement=THREAD):
+        stage = Stage(name, func, placement, source=True, context=self.context)
+        self.stages[name] = stage
+        self._last = stage
+        return stage
+
+    def add_stage(self, name, func, policy=DROP_OLDEST, maxsize=2, placement=THREAD, after=None, when=None):
+        """
+        ステージを追加する。after を省略すると直前に追加したステージの後ろにつなぐ。
+        policy / maxsize は、上流からこのステージへの辺のキューの扱い。
+        when を指定すると、上流の結果のうち when(result) が True のものだけを受け取る。
+        """
+        upstream = self.stages[after] if after is not None else self._last
+        if upstream is None:
+            raise ValueError("先に add_source() で入力のステージを追加してください")
+        stage = Stage(name, func, placement, context=self.context)
+        if placement == PROCESS or upstream.placement == PROCESS:
+            edge = ProcessEdge(self.context, maxsize, policy)
+        else:
+            edge = ThreadEdge(maxsize, policy)
+        edge.when = when
+        stage.input = edge
+        upstream.outputs.append(edge)
+        self.stages[name] = stage
+        self._last = stage
+        return stage
+
+    def start(self):
+        self._started_at = time.time()
+        for stage in self.stages.values():
+            args = (stage.func, stage.source, stage.input, stage.outputs,
+                    stage._processed, stage._busy, self._stop_event)
+            if stage.placement == PROCESS:
+                stage._worker = self.context.Process(target=_run_stage, args=args, name=stage.name, daemon=True)
+            else:
+                stage._worker = threading.Thread(target=_run_stage, args=args, name=stage.name, daemon=True)
+            stage._worker.start()
+        return self
+
+    def stop(self):
+        """すべてのステージに止まるように伝える（どのステージからでも呼べる）"""
+        self._stop_event.set()
+
+    def join(self, timeout=None):
+        """
+        すべてのステージが終わるまで待つ。
+        stop() の後 stop_grace 秒たっても終わらないプロセスのステージは terminate() する。
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        stopped_at = None
+        for stage in self.stages.values():
+            worker = stage._worker
+            while worker is not None and worker.is_alive():
+                if deadline is not None and time.time() >= deadline:
+                    break
+                worker.join(0.1)
+                if stage.placement != PROCESS or not self._stop_event.is_set():
+                    continue
+                stopped_at = stopped_at or time.time()
+                if worker.is_alive() and time.time() - stopped_at > stop_grace:
+                    print(f"ステージ {stage.name} が終わらないため強制終了します")
+                    worker.terminate()
+                    worker.join()
+        self._finished_at = time.time()
+
+    def run(self):
+        """開始して、終わるまで待つ"""
+        self.start()
+        try:
+            self.join()
+        except KeyboardInterrupt:
+            self.stop()
+            self.join(timeout=2.0)
+
+    def report(self):
+        """ステージごとの処理数・速さ・忙しさと、辺ごとの捨てた数を表示する"""
+        end = self._finished_at or time.time()
+        elapsed = end - self._started_at if self._started_at else 0.0
+        print(f"{'ステージ':<10}{'配置':>9}{'処理数':>8}{'fps':>8}{'稼働率':>8}{'捨てた数':>10}  キュー")
+        for stage in self.stages.values():
+            rate = stage.processed / elapsed if elapsed > 0 else 0.0
+            busy = stage.busy / elapsed if elapsed > 0 else 0.0
+            edge = stage.input
+            dropped = edge.dropped if edge is not None else 0
+            policy = f"{edge.policy} ({edge.maxsize})" if edge is not None else "-"
+            print(f"{stage.name:<10}{stage.placement:>9}{stage.processed:>8}{rate:>8.1f}{busy:>8.0%}{dropped:>10}  {policy}")
+
+
+def parse_assignments(values, choices):
+    """["detect=process", ...] を {"detect": "process"} にする（argparse の値の変換用）"""
+    result = {}
+    for value in values or []:
+        name, _, setting = value.partition("=")
+        if setting not in choices:
+            raise ValueError(f"{value}: {', '.join(choices)} のどれかを指定してください")
+        result[name] = setting
+    return result
@@ -1,3 +1,6 @@
+import queue
+import threading
+
 import numpy as np
 import sounddevice as sd
 
@@ -29,28 +32,85 @@ duration = 0.125  # 各音の長さ
 sample_rate = 44100
 sd.default.blocksize = 0  # 自動設定
 
-# warm up
-silent_tone = np.zeros(int(sample_rate * 2))  # 無音
-sd.play(silent_tone, samplerate=sample_rate)
-sd.wait()
+lead_in = 0.0625  # 音の前に入れる無音の長さ
+_rendered = {}  # 音名 -> 作成済みのバッファ
 
 
-# 各音を順番に再生
-for note, freq in notes.items():
-    print(f"Playing {note} ({freq} Hz)")
-    tone = generate_tone(freq, duration, sample_rate)
-    sd.play(tone, samplerate=sample_rate)
+def warmup():
+    """最初の音が遅れないように、無音を再生して出力デバイスを準備しておく"""
+    silent_tone = np.zeros(int(sample_rate * 2))  # 無音
+    sd.play(silent_tone, samplerate=sample_rate)
     sd.wait()
 
-def play_note(note):
-    silent_tone = np.zeros(int(sample_rate * 0.0625))  # 無音
-    sd.play(silent_tone, samplerate=sample_rate,latency='high')
-    sd.wait()
-    tone = generate_tone(notes[note], duration, sample_rate)
-    sd.play(tone, samplerate=sample_rate,latency='high')
+
+def render_note(note):
+    """
+    音名に対応する、再生できるバッファ（無音 + トーン）を返す。
+    一度作ったバッファは使い回すので、鳴らすたびにトーンを合成しない。
+    """
+    if note not in _rendered:
+        silent_tone = np.zeros(int(sample_rate * lead_in))  # 無音
+        tone = generate_tone(notes[note], duration, sample_rate)
+        _rendered[note] = np.concatenate([silent_tone, tone]).astype(np.float32)
+    return _rendered[note]
+
+
+def play_buffer(buffer):
+    """render_note() で作ったバッファを再生し、終わるまで待つ"""
+    sd.play(buffer, samplerate=sample_rate, latency='high')
     sd.wait()
 
-play_note("C4")
-play_note("E4")
-play_note("G4")
-play_note("C5")
\ No newline at end of file
+
+def play_note(note):
+    play_buffer(render_note(note))
+
+# 裏のスレッドで順番に鳴らす音のキュー
+_note_queue = queue.Queue()
+_note_thread = None
+
+
+def _note_worker():
+    while True:
+        buffer = _note_queue.get()
+        try:
+            play_buffer(buffer)
+        finally:
+            _note_queue.task_done()
+
+
+def play_buffer_async(buffer):
+    """音を鳴らし終わるのを待たずに戻る。鳴らす音は裏のスレッドで順番に再生する"""
+    global _note_thread
+    if _note_thread is None:
+        _note_thread = threading.Thread(target=_note_worker, name="NotePlayer", daemon=True)
+        _note_thread.start()
+    _note_queue.put(buffer)
+
+
+def play_note_async(note):
+    play_buffer_async(render_note(note))
+
+
+def drain():
+    """
+    裏のスレッドに積んだ音をすべて鳴らし終わるまで待つ。
+    sd.play() はスレッドセーフではなく、別のスレッドから鳴らすと再生中の音が切れるので、
+    play_buffer() / play_note() をこのスレッドで使う前に呼ぶ。
+    """
+    _note_queue.join()
+
+
+if __name__ == "__main__":
+    warmup()
+
+    # 各音を順番に再生
+    for note, freq in notes.items():
+        print(f"Playing {note} ({freq} Hz)")
+        tone = generate_tone(freq, duration, sample_rate)
+        sd.play(tone, samplerate=sample_rate)
+        sd.wait()
+
+    play_note("C4")
+    play_note("E4")
+    play_note("G4")
+    play_note("C5")
@@ -0,0 +1,218 @@
+import argparse
+import json
+import math
+import os
+import random
+
+import numpy as np
+
+# 分位点を出す列（ScoreRecords.SCORE_DTYPE のフィールド名）と表示名
+FIELDS = (("confidence", "信頼度"), ("area", "面積"), ("total", "加点"))
+REPORT_QUANTILES = (0.5, 0.9, 0.99)
+
+default_k = 200  # 大きいほど正確になり、メモリも増える（k=200 で順位の誤差はおよそ1%）
+
+
+class KllSketch:
+    """
+    KLL 方式の分位点スケッチ。
+    値をすべて保存する代わりに、レベルごとの「圧縮器」に間引いた値だけを持つ。
+    レベル h の値は 2^h 個分の重みを持ち、メモリは値の個数によらずほぼ一定になる。
+    別のスケッチと merge() でき、to_dict() / from_dict() で JSON にして保存できる。
+    """
+
+    def __init__(self, k=default_k, c=2 / 3, seed=None):
+        self.k = k
+        self.c = c
+        self.levels = [[]]
+        self.count = 0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self._random = random.Random(seed)
+        self._size = 0
+        self._max_size = self._capacity(0)
+
+    def _capacity(self, level):
+        # 上のレベルほど容量が大きい（一番上が k）
+        depth = len(self.levels) - level - 1
+        return int(math.ceil(self.c ** depth * self.k)) + 1
+
+    def _grow(self):
+        self.levels.append([])
+        self._max_size = sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def _compress(self):
+        """容量を超えた一番下のレベルを半分に間引いて1つ上のレベルに送る"""
+        for h, items in enumerate(self.levels):
+            if len(items) >= self._capacity(h):
+                if h + 1 >= len(self.levels):
+                    self._grow()
+                items.sort()
+                # 個数が奇数なら1つだけ残し、残りの偶数番目か奇数番目を無作為に選んで上に送る
+                keep = items[:len(items) % 2]
+                offset = len(keep) + self._random.randint(0, 1)
+                self.levels[h + 1].extend(items[offset::2])
+                self.levels[h] = keep
+                break
+        self._size = sum(len(items) for items in self.levels)
+
+    def update(self, value):
+        """値を1つ加える"""
+        self.update_many(np.asarray([value]))
+
+    def update_many(self, values):
+        """配列の値をまとめて加える"""
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.min = min(self.min, values.min().item())
+        self.max = max(self.max, values.max().item())
+        for value in np.asarray(values, dtype=np.float64).tolist():
+            self.levels[0].append(value)
+            self._size += 1
+            if self._size >= self._max_size:
+                self._compress()
+
+    def merge(self, other):
+        """別のスケッチの内容を加える（同じ k 同士で使う）"""
+        while len(self.levels) < len(other.levels):
+            self._grow()
+        for h, items in enumerate(other.levels):
+            self.levels[h].extend(items)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._size = sum(len(items) for items in self.levels)
+        while self._size >= self._max_size:
+            self._compress()
+
+    def quantiles(self, qs):
+        """分位点（0〜1 のリスト）に対応する値のリストを返す。値がなければ 0"""
+        if not self.count:
+            return [0.0 for _ in qs]
+        values = np.concatenate([np.asarray(items, dtype=np.float64) for items in self.levels])
+        weights = np.concatenate([np.full(len(items), 2 ** h, dtype=np.int64) for h, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        values, cumulative = values[order], np.cumsum(weights[order])
+        results = []
+        for q in qs:
+            if q <= 0:
+                results.append(self.min)
+            elif q >= 1:
+                results.append(self.max)
+            else:
+                index = int(np.searchsorted(cumulative, q * cumulative[-1]))
+                results.append(float(values[min(index, len(values) - 1)]))
+        return results
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
+
+    def to_dict(self):
+        """JSON に保存できる形にする"""
+        return {
+            "k": self.k, "c": self.c, "count": self.count,
+            "min": self.min if self.count else None, "max": self.max if self.count else None,
+            "levels": [list(items) for items in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["k"], data["c"])
+        sketch.levels = [list(items) for items in data["levels"]] or [[]]
+        sketch.count = data["count"]
+        if data["count"]:
+            sketch.min, sketch.max = data["min"], data["max"]
+        sketch._max_size = sum(sketch._capacity(h) for h in range(len(sketch.levels)))
+        sketch._size = sum(len(items) for items in sketch.levels)
+        return sketch
+
+
+class SessionQuantiles:
+    """
+    信頼度・面積・加点の分位点スケッチをまとめたもの。
+    採点のたびに update() し、セッションの終わりに save() すると、
+    あとで複数のセッション（複数の端末）の結果を merge() して全体の分位点を出せる。
+    """
+
+    def __init__(self, k=default_k):
+        self.sketches = {field: KllSketch(k) for field, _ in FIELDS}
+        self.sessions = 1  # 足し合わせたセッションの数
+
+    def update(self, scores):
+        """1回分の採点結果 (ScoreRecords.SCORE_DTYPE) を加える"""
+        for field, _ in FIELDS:
+            self.sketches[field].update_many(scores[field])
+
+    def merge(self, other):
+        for field, _ in FIELDS:
+            self.sketches[field].merge(other.sketches[field])
+        self.sessions += other.sessions
+
+    def summary(self, qs=REPORT_QUANTILES):
+        """{表示名: [分位点の値, ...]} を返す"""
+        return {label: self.sketches[field].quantiles(qs) for field, label in FIELDS}
+
+    def report_lines(self, qs=REPORT_QUANTILES):
+        """表示用の文字列のリスト（例: "加点: p50 40, p90 75, p99 98"）"""
+        lines = []
+        for label, values in self.summary(qs).items():
+            parts = ", ".join(f"p{q * 100:g} {value:.2f}" if label == "信頼度" else f"p{q * 100:g} {value:.0f}"
+                              for q, value in zip(qs, values))
+            lines.append(f"{label}: {parts}")
+        return lines
+
+    def to_dict(self):
+        return {"sessions": self.sessions,
+                "sketches": {field: sketch.to_dict() for field, sketch in self.sketches.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        quantiles = cls()
+        quantiles.sessions = data.get("sessions", 1)
+        quantiles.sketches = {field: KllSketch.from_dict(sketch) for field, sketch in data["sketches"].items()}
+        return quantiles
+
+    def save(self, path):
+        """JSON ファイルに保存する"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def merge_files(paths):
+    """保存した複数のセッションを1つにまとめる"""
+    merged = None
+    for path in paths:
+        quantiles = SessionQuantiles.load(path)
+        if merged is None:
+            merged = quantiles
+        else:
+            merged.merge(quantiles)
+    return merged
+
+
+def add_sketch_arguments(parser):
+    """argparse に分位点スケッチのオプションを追加する"""
+    parser.add_argument("--sketch-out", default=None,
+                        help="信頼度・面積・加点の分位点スケッチを保存する JSON ファイル（あとで QuantileSketch.py でまとめられる）")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="保存した分位点スケッチをまとめて p50/p90/p99 を表示する")
+    parser.add_argument("files", nargs="+", help="--sketch-out で保存した JSON ファイル")
+    parser.add_argument("--out", default=None, help="まとめたスケッチを保存するファイル")
+    args = parser.parse_args()
+    merged = merge_files(args.files)
+    print(f"セッション数: {merged.sessions}, 検出数: {merged.sketches['total'].count}")
+    for line in merged.report_lines():
+        print(line)
+    if args.out:
+        merged.save(args.out)
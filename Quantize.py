@@ -0,0 +1,205 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+import Detector as dt  # local unofficial
+import OnnxBackend as ob  # local unofficial
+
+MODES = ("dynamic", "static")
+calibration_dir = "calibration"  # 静的量子化のキャリブレーション画像の既定のディレクトリ
+max_calibration_images = 200
+
+
+def list_images(image_dir):
+    """ディレクトリ内の画像ファイルを名前順に返す"""
+    return sorted(
+        path for path in glob.glob(os.path.join(image_dir, "*"))
+        if path.lower().endswith((".jpg", ".jpeg", ".png", ".bmp"))
+    )
+
+
+class ImageCalibrationReader:
+    """静的量子化のキャリブレーション用に、画像を推論時と同じ前処理をして渡す"""
+
+    def __init__(self, image_dir, input_name, size=ob.imgsz):
+        self.paths = list_images(image_dir)[:max_calibration_images]
+        self.input_name = input_name
+        self.size = size
+        self._position = 0
+
+    def get_next(self):
+        # onnxruntime.quantization.CalibrationDataReader と同じインターフェース
+        while self._position < len(self.paths):
+            frame = cv2.imread(self.paths[self._position])
+            self._position += 1
+            if frame is None:
+                continue
+            boxed, _, _ = ob.letterbox(frame, self.size)
+            blob = cv2.dnn.blobFromImage(boxed, scalefactor=1 / 255.0, swapRB=True)
+            return {self.input_name: blob}
+        return None
+
+    def rewind(self):
+        self._position = 0
+
+
+def quantized_path(weights, mode, image_dir=None, size=ob.imgsz):
+    """INT8 モデルのキャッシュのパス。静的量子化はキャリブレーション画像の一覧もキーに含める"""
+    fp32_path, _ = ob.export_onnx(weights, size)
+    key = mode
+    if mode == "static":
+        names = "\n".join(os.path.basename(path) for path in list_images(image_dir))
+        key += "-" + hashlib.sha256(names.encode("utf-8")).hexdigest()[:8]
+    return os.path.splitext(fp32_path)[0] + f"-int8-{key}.onnx"
+
+
+def quantize(weights="best.pt", mode="dynamic", image_dir=calibration_dir, size=ob.imgsz):
+    """
+    best.pt から INT8 の ONNX モデルを作ってキャッシュし、そのパスを返す。
+    - dynamic: 重みだけを INT8 にする（キャリブレーション不要）
+    - static: image_dir の画像で活性値の範囲を調べ、活性値も INT8 にする
+    """
+    from onnxruntime import quantization as q  # 量子化するときだけ必要
+    fp32_path, _ = ob.export_onnx(weights, size)
+    out_path = quantized_path(weights, mode, image_dir, size)
+    if os.path.exists(out_path):
+        if loadable(out_path):
+            return out_path
+        os.remove(out_path)  # 以前の版で作った、読み込めないキャッシュは作り直す
+
+    print(f"{weights} を INT8 ({mode}) に量子化しています...")
+    if mode == "dynamic":
+        # 重みを QInt8 にすると畳み込みが ConvInteger (int8) になり、CPU の ONNX Runtime には
+        # その実装がなくて読み込めない。重みは QUInt8 にする
+        q.quantize_dynamic(fp32_path, out_path, weight_type=q.QuantType.QUInt8)
+    elif mode == "static":
+        if not list_images(image_dir):
+            raise ValueError(f"キャリブレーション画像が見つかりません: {image_dir}")
+        import onnxruntime as ort
+        input_name = ort.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+        q.quantize_static(
+            fp32_path, out_path, ImageCalibrationReader(image_dir, input_name, size),
+            quant_format=q.QuantFormat.QDQ, per_channel=True,
+            activation_type=q.QuantType.QUInt8, weight_type=q.QuantType.QInt8)
+    else:
+        raise ValueError(f"未知の量子化方式です: {mode}")
+    if not loadable(out_path):
+        os.remove(out_path)  # 読み込めないモデルはキャッシュに残さない
+        raise RuntimeError(f"量子化したモデルを ONNX Runtime で読み込めません ({mode}): {out_path}")
+    return out_path
+
+
+def loadable(model_path):
+    """ONNX Runtime (CPU) でモデルを読み込めるか（実装のない演算子があると読み込めない）"""
+    import onnxruntime as ort
+    try:
+        ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+    except Exception as e:
+        print(f"{model_path} を読み込めません: {e}")
+        return False
+    return True
+
+
+def create_int8_detector(weights="best.pt", mode="dynamic", threads=None, image_dir=calibration_dir):
+    """INT8 モデルを ONNX Runtime で読み込んだ Detector を返す（FP32 と同じ前処理・後処理を使う）"""
+    return ob.OnnxDetector(weights, threads=threads, model_path=quantize(weights, mode, image_dir))
+
+
+def match_confidences(reference, candidate, iou_min=0.5):
+    """
+    同じクラスで IoU が最大の検出を対応させ、(クラスID, 基準の信頼度, 比較対象の信頼度) を返す。
+    対応が見つからないものは比較対象の信頼度を 0 とする。
+    """
+    pairs = []
+    used = np.zeros(len(candidate), dtype=bool)
+    for ref in reference:
+        same_class = (candidate[:, 5] == ref[5]) & ~used
+        ious = np.where(same_class, dt.box_iou(ref[:4], candidate[:, :4]), -1.0)
+        if len(ious) and ious.max() >= iou_min:
+            best = int(ious.argmax())
+            used[best] = True
+            pairs.append((int(ref[5]), float(ref[4]), float(candidate[best, 4])))
+        else:
+            pairs.append((int(ref[5]), float(ref[4]), 0.0))
+    return pairs
+
+
+def measure(detector, frames, warmup=3):
+    """画像ごとの検出結果と、推論1回あたりの平均時間 (秒) を返す"""
+    for frame in frames[:warmup]:
+        detector.infer(frame)
+    results = []
+    start = time.perf_counter()
+    for frame in frames:
+        results.append(detector.infer(frame))
+    return results, (time.perf_counter() - start) / max(len(frames), 1)
+
+
+def report(weights="best.pt", image_dir=calibration_dir, modes=MODES, threads=None):
+    """
+    FP32 と INT8 のモデルを image_dir の画像で比べ、
+    推論時間・モデルサイズ・クラスごとの信頼度のずれをまとめた辞書を返す。
+    """
+    frames = [frame for frame in (cv2.imread(path) for path in list_images(image_dir)) if frame is not None]
+    if not frames:
+        raise ValueError(f"画像が見つかりません: {image_dir}")
+
+    fp32 = ob.OnnxDetector(weights, threads=threads)
+    fp32_path, names = ob.export_onnx(weights)
+    reference, fp32_latency = measure(fp32, frames)
+    summary = {
+        "fp32": {"latency_ms": fp32_latency * 1000, "size_mb": os.path.getsize(fp32_path) / 1e6},
+    }
+    for mode in modes:
+        detector = create_int8_detector(weights, mode, threads, image_dir)
+        results, latency = measure(detector, frames)
+        drift = {}
+        for ref, cand in zip(reference, results):
+            for class_id, ref_conf, cand_conf in match_confidences(ref, cand):
+                drift.setdefault(names[class_id], []).append(cand_conf - ref_conf)
+        summary[f"int8-{mode}"] = {
+            "latency_ms": latency * 1000,
+            "size_mb": os.path.getsize(quantized_path(weights, mode, image_dir)) / 1e6,
+            "speedup": fp32_latency / latency if latency else 0.0,
+            "detections": int(sum(len(r) for r in results)),
+            "fp32_detections": int(sum(len(r) for r in reference)),
+            "confidence_drift": {
+                label: {"mean": float(np.mean(d)), "max_abs": float(np.max(np.abs(d))), "count": len(d)}
+                for label, d in drift.items()
+            },
+        }
+    return summary
+
+
+def print_report(summary):
+    """report() の結果を表にして表示する"""
+    print(f"{'モデル':<16}{'推論時間(ms)':>14}{'サイズ(MB)':>12}{'速度比':>8}")
+    for name, row in summary.items():
+        print(f"{name:<16}{row['latency_ms']:>14.1f}{row['size_mb']:>12.1f}{row.get('speedup', 1.0):>8.2f}")
+    for name, row in summary.items():
+        if "confidence_drift" not in row:
+            continue
+        print(f"--- {name} の信頼度のずれ (FP32 比, 検出数 {row['fp32_detections']} -> {row['detections']}) ---")
+        for label, d in row["confidence_drift"].items():
+            print(f"  {label}: 平均 {d['mean']:+.3f}, 最大 {d['max_abs']:.3f} ({d['count']}件)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="best.pt の INT8 版を作り、FP32 と比べる")
+    parser.add_argument("--weights", default="best.pt")
+    parser.add_argument("--images", default=calibration_dir, help="キャリブレーション・評価に使う画像のディレクトリ")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--json", default=None, help="結果を JSON で保存するファイル")
+    args = parser.parse_args()
+    result = report(args.weights, args.images, args.modes, args.threads)
+    print_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,186 @@
+import argparse
+import os
+import struct
+import time
+
+import numpy as np
+
+import CaptureConfig as cc  # local unofficial
+import FrameSource as fs  # local unofficial
+
+# ファイル形式
+#   ヘッダ (64バイト): マジック, 幅, 高さ, チャンネル数, フレーム数
+#   レコード列: [タイムスタンプ(float64) + BGRフレーム(uint8, 高さ x 幅 x チャンネル)] x フレーム数
+# フレームは固定サイズなので、デコードせずにメモリマップしたまま NumPy 配列として使える。
+MAGIC = b"IDRAW001"
+HEADER_FORMAT = "<8sIIIQ"
+HEADER_SIZE = 64
+
+
+def record_dtype(width, height, channels=3):
+    """1フレーム分のレコードの型"""
+    return np.dtype([("timestamp", "<f8"), ("frame", np.uint8, (height, width, channels))])
+
+
+def read_header(path):
+    """ヘッダを読み込み (width, height, channels, count) を返す"""
+    with open(path, "rb") as f:
+        magic, width, height, channels, count = struct.unpack(
+            HEADER_FORMAT, f.read(struct.calcsize(HEADER_FORMAT)))
+    if magic != MAGIC:
+        raise ValueError(f"raw フレームファイルではありません: {path}")
+    return width, height, channels, count
+
+
+class RawRecorder:
+    """
+    フレームをメモリマップしたファイルにそのまま書き込む。
+    容量が足りなくなったら倍に広げるので、1フレームあたりの書き込みコストは一定。
+    """
+
+    def __init__(self, path, width, height, channels=3, initial_frames=256):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.dtype = record_dtype(width, height, channels)
+        self.count = 0
+        self.capacity = 0
+        with open(path, "wb") as f:
+            f.write(b"\0" * HEADER_SIZE)
+        self._write_header()
+        self._records = None
+        self._grow(initial_frames)
+
+    def _write_header(self):
+        with open(self.path, "r+b") as f:
+            f.write(struct.pack(HEADER_FORMAT, MAGIC, self.width, self.height, self.channels, self.count))
+
+    def _grow(self, capacity):
+        """ファイルを広げてメモリマップを作り直す"""
+        if self._records is not None:
+            self._records.flush()
+            self._records = None
+        with open(self.path, "r+b") as f:
+            f.truncate(HEADER_SIZE + capacity * self.dtype.itemsize)
+        self._records = np.memmap(self.path, dtype=self.dtype, mode="r+",
+                                  offset=HEADER_SIZE, shape=(capacity,))
+        self.capacity = capacity
+
+    def write(self, frame, timestamp=None):
+        """フレームを1枚追加する"""
+        if frame.shape != (self.height, self.width, self.channels):
+            raise ValueError(f"フレームサイズが違います: {frame.shape}")
+        if self.count >= self.capacity:
+            self._grow(self.capacity * 2)
+        record = self._records[self.count]
+        record["timestamp"] = time.time() if timestamp is None else timestamp
+        record["frame"] = frame
+        self.count += 1
+
+    def close(self):
+        """未使用の領域を切り詰め、フレーム数をヘッダに書き込む"""
+        if self._records is None:
+            return
+        self._records.flush()
+        self._records = None
+        with open(self.path, "r+b") as f:
+            f.truncate(HEADER_SIZE + self.count * self.dtype.itemsize)
+        self._write_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RawFrameSource(fs.FrameSource):
+    """
+    RawRecorder で記録したファイルを再生する。
+    フレームはデコードせず、読み取り専用のメモリマップから1回コピーするだけで返す。
+    retrieve(image) にバッファを渡せばそこへコピーするので、新しく確保もしない。
+    （ゲームはフレームに直接描くので、ビューをそのまま返すと次の周に描いたものが残ってしまう）
+    """
+
+    fills_image = True
+
+    def __init__(self, path, realtime=False, loop=False):
+        width, height, channels, count = read_header(path)
+        if count == 0:
+            raise ValueError(f"フレームが記録されていません: {path}")
+        self.records = np.memmap(path, dtype=record_dtype(width, height, channels), mode="r",
+                                 offset=HEADER_SIZE, shape=(count,))
+        self.frames = self.records["frame"]
+        self.timestamps = self.records["timestamp"]
+        duration = float(self.timestamps[-1] - self.timestamps[0]) if count > 1 else 0.0
+        fps = (count - 1) / duration if duration > 0 else 30.0
+        super().__init__(realtime=realtime, fps=fps)
+        self.duration = duration + 1.0 / self.fps  # 1周の長さ（最後のフレームの表示時間を含む）
+        self.loop = loop
+        self._position = 0
+        self._current = None
+        self._loop_offset = 0.0  # ループした分だけ再生位置を進める（時計が戻らないように）
+
+    def grab(self):
+        if self._position >= len(self.frames):
+            if not self.loop or len(self.frames) == 0:
+                return False
+            self._position = 0
+            self._loop_offset += self.duration
+        # 記録時のタイムスタンプ（先頭からの経過秒）に、ループした周の長さを足して再生位置にする
+        self.last_timestamp = self._loop_offset + float(self.timestamps[self._position] - self.timestamps[0])
+        self._current = self._position
+        self._position += 1
+        self.frame_index += 1
+        if self.realtime:
+            self._pace()
+        return True
+
+    def retrieve(self, image=None):
+        frame = self.frames[self._current]
+        if image is not None and image.shape == frame.shape and image.dtype == frame.dtype:
+            np.copyto(image, frame)  # 渡されたバッファにコピーする（新しく確保しない）
+            return True, image
+        return True, np.array(frame)
+
+    def isOpened(self):
+        return len(self.frames) > 0
+
+    def release(self):
+        self.records = None
+        self.frames = None
+        self.timestamps = None
+
+
+def record(source, path, max_frames=None):
+    """供給元から読めるだけフレームを読み、raw ファイルに記録する。記録した枚数を返す"""
+    recorder = None
+    try:
+        while max_frames is None or recorder is None or recorder.count < max_frames:
+            ret, frame = source.read()
+            if not ret:
+                break
+            if recorder is None:
+                height, width, channels = frame.shape
+                recorder = RawRecorder(path, width, height, channels)
+            timestamp = getattr(source, "last_timestamp", None)
+            recorder.write(frame, timestamp)
+    finally:
+        if recorder is not None:
+            recorder.close()
+        source.release()
+    return recorder.count if recorder is not None else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="フレームを raw ファイルに記録する")
+    fs.add_source_arguments(parser)
+    cc.add_capture_arguments(parser)
+    parser.add_argument("output", help="出力する raw ファイル")
+    parser.add_argument("--max-frames", type=int, default=None, help="記録する最大フレーム数")
+    args = parser.parse_args()
+    if args.source is None:
+        args.source = "0"  # 指定がなければカメラ0から記録する
+    count = record(fs.source_from_args(args), args.output, args.max_frames)
+    print(f"{count} フレームを {args.output} に記録しました ({os.path.getsize(args.output)} バイト)")
@@ -0,0 +1,100 @@
+import heapq
+import itertools
+
+import cv2
+import numpy as np
+
+import ScoreRecords as sr  # local unofficial
+
+top_k = 5  # 結果画面に出す上位・下位の件数
+# 加点のヒストグラムの区切り（この外側は「未満」「以上」にまとめる）
+histogram_edges = (0, 25, 50, 75, 100)
+
+
+class ResultsSummary:
+    """
+    結果画面のための集計。全スコアを保存する代わりに、
+    ヒープで加点の上位・下位 K 件だけを残し、残りは加点のヒストグラムに数えるだけにする。
+    メモリは K とヒストグラムの区切りの数だけで決まる。
+
+        results = ResultsSummary()
+        results.update(frame_scores)  # 採点のたびに
+        screen = results.render(frame, model.names, box_color)  # 最後に1枚の画像にまとめる
+    """
+
+    def __init__(self, k=top_k, edges=histogram_edges):
+        self.k = k
+        self.edges = np.asarray(edges)
+        self.histogram = np.zeros(len(edges) + 1, dtype=np.int64)
+        self._top = []  # (加点, 順番, 行) の最小ヒープ（先頭が上位 K 件の中で一番低い）
+        self._bottom = []  # (-加点, -順番, 行) の最小ヒープ（先頭が下位 K 件の中で一番高い）
+        self._counter = itertools.count()
+
+    def update(self, scores):
+        """1回分の採点結果 (ScoreRecords.SCORE_DTYPE) を加える"""
+        if len(scores) == 0:
+            return
+        self.histogram += np.bincount(np.digitize(scores["total"], self.edges), minlength=len(self.histogram))
+        for row in scores.tolist():
+            total, order = row[3], next(self._counter)
+            if len(self._top) < self.k:
+                heapq.heappush(self._top, (total, order, row))
+            elif total > self._top[0][0]:
+                heapq.heapreplace(self._top, (total, order, row))
+            if len(self._bottom) < self.k:
+                heapq.heappush(self._bottom, (-total, -order, row))
+            elif total < -self._bottom[0][0]:
+                heapq.heapreplace(self._bottom, (-total, -order, row))
+
+    def records(self):
+        """上位・下位 K 件を加点の昇順で返す（両方に入っているものは1件にする）"""
+        rows = {order: (total, row) for total, order, row in self._top}
+        rows.update({-order: (-total, row) for total, order, row in self._bottom})
+        ordered = [rows[order][1] for order in sorted(rows, key=lambda order: (rows[order][0], order))]
+        return np.array(ordered, dtype=sr.SCORE_DTYPE)
+
+    def histogram_labels(self):
+        """ヒストグラムの各区間の名前"""
+        edges = self.edges.tolist()
+        labels = [f"<{edges[0]}"]
+        labels += [f"{low}-{high - 1}" for low, high in zip(edges, edges[1:])]
+        labels.append(f">={edges[-1]}")
+        return labels
+
+    def render(self, frame, names, color_for):
+        """
+        上位・下位 K 件のボックスと、加点のヒストグラムを1枚の画像にまとめて返す。
+        color_for(total) はボックスの色 (BGR) を返す関数。
+        """
+        screen = frame.copy()
+        records = self.records()
+        for label, confidence, area, total, bbox in sr.as_tuples(records, names):
+            color = color_for(total)
+            x1, y1, x2, y2 = map(int, bbox)
+            cv2.rectangle(screen, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(screen, f"{label} ({total:03}pts)", (x1, y1 - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        self._draw_histogram(screen)
+        return screen
+
+    def _draw_histogram(self, screen, width=200, row_height=18):
+        """画面の右上に加点のヒストグラムを半透明で描く"""
+        labels = self.histogram_labels()
+        height = row_height * (len(labels) + 1) + 10
+        x0 = max(screen.shape[1] - width - 10, 0)
+        y0 = 10
+        panel = screen[y0:y0 + height, x0:x0 + width]
+        # 背景を暗くする（この部分だけ合成する）
+        cv2.addWeighted(panel, 0.4, np.zeros_like(panel), 0.6, 0, dst=panel)
+
+        cv2.putText(screen, f"points (total {int(self.histogram.sum())})", (x0 + 5, y0 + row_height - 4),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 255), 1)
+        peak = max(int(self.histogram.max()), 1)
+        bar_width = width - 90
+        for i, (label, count) in enumerate(zip(labels, self.histogram.tolist())):
+            y = y0 + row_height * (i + 2) - 4
+            cv2.putText(screen, label, (x0 + 5, y), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+            length = int(bar_width * count / peak)
+            if length:
+                cv2.rectangle(screen, (x0 + 55, y - row_height + 8), (x0 + 55 + length, y), (0, 255, 255), -1)
+            cv2.putText(screen, str(count), (x0 + 60 + length, y), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
@@ -0,0 +1,90 @@
+import threading
+
+import cv2
+
+import GlyphCache as gc  # local unofficial
+
+reveal_interval = 0.05  # 次のボックスを出すまでの間隔 (秒)
+hold_time = 0.5  # 最後のボックスを出してから表示をキープする時間 (秒)
+
+
+class RevealEvent:
+    """1つのボックスを出す予定（start 以降のフレームに描く）"""
+
+    __slots__ = ("start", "bbox", "text", "color", "on_reveal", "revealed")
+
+    def __init__(self, start, bbox, text, color, on_reveal=None):
+        self.start = start
+        self.bbox = tuple(map(int, bbox))
+        self.text = text
+        self.color = color
+        self.on_reveal = on_reveal  # 出した瞬間に1回だけ呼ぶ（コンソール表示や音など）
+        self.revealed = False
+
+
+class RevealScheduler:
+    """
+    採点したボックスを1件ずつ出していく演出を、ブロックせずに行う。
+    imshow / waitKey で待つ代わりに予定だけを積んでおき、
+    以降のフレームごとに draw() で「もう出す時刻になったもの」を重ねて描く。
+    カメラ映像・カウントダウン・'q' の入力は演出中も止まらない。
+
+        reveal = RevealScheduler()
+        reveal.add(clock(), bbox, "kinoko (040pts)", (0, 255, 0))  # 採点したとき
+        reveal.draw(frame, clock())  # 毎フレーム
+    """
+
+    def __init__(self, interval=reveal_interval, hold=hold_time):
+        self.interval = interval
+        self.hold = hold
+        self._events = []
+        self._next_start = float("-inf")
+        self._hold_until = float("-inf")
+        self._lock = threading.Lock()  # 採点と描画が別のスレッドでも使えるようにする
+
+    def add(self, now, bbox, text, color, on_reveal=None):
+        """ボックスを出す予定を追加する。前の予定より interval だけ後に出る"""
+        with self._lock:
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+            self._hold_until = start + self.hold
+            self._events.append(RevealEvent(start, bbox, text, color, on_reveal))
+
+    def active(self, now):
+        """まだ出していない、または表示中のボックスがあれば True"""
+        return bool(self._events) and now < self._hold_until
+
+    def draw(self, frame, now):
+        """出す時刻になったボックスを frame に描く。キープ時間が過ぎたら予定を空にする"""
+        with self._lock:
+            if not self._events:
+                return frame
+            if now >= self._hold_until:
+                expired, self._events = self._events, []
+            else:
+                expired = None
+                due = [event for event in self._events if event.start <= now]
+        if expired is not None:
+            # 予定がまだ残っていても、呼び出されずに時間が過ぎたものは出したことにする
+            for event in expired:
+                self._reveal(event)
+            return frame
+        for event in due:
+            self._reveal(event)
+            x1, y1, x2, y2 = event.bbox
+            cv2.rectangle(frame, (x1, y1), (x2, y2), event.color, 2)
+            # 同じラベルは何度も出るので、描いた文字をキャッシュして使い回す
+            gc.put_text(frame, event.text, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, event.color, 2)
+        return frame
+
+    def _reveal(self, event):
+        if not event.revealed:
+            event.revealed = True
+            if event.on_reveal is not None:
+                event.on_reveal()
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._next_start = float("-inf")
+            self._hold_until = float("-inf")
@@ -0,0 +1,74 @@
+import numpy as np
+
+# 検出結果1件分（ラベル文字列の代わりにクラスIDを持つ。packed で 26 バイト）
+DETECTION_DTYPE = np.dtype([
+    ("class_id", "<i2"),
+    ("confidence", "<f4"),
+    ("area", "<f4"),
+    ("bbox", "<f4", (4,)),  # x1, y1, x2, y2
+])
+
+# 採点結果1件分（検出結果 + 加点。packed で 30 バイト）
+SCORE_DTYPE = np.dtype([
+    ("class_id", "<i2"),
+    ("confidence", "<f4"),
+    ("area", "<f4"),
+    ("total", "<i4"),
+    ("bbox", "<f4", (4,)),
+])
+
+
+def detections_from_columns(class_ids, confidences, areas, boxes):
+    """列ごとの配列から検出結果の構造化配列を作る"""
+    records = np.empty(len(class_ids), dtype=DETECTION_DTYPE)
+    records["class_id"] = class_ids
+    records["confidence"] = confidences
+    records["area"] = areas
+    records["bbox"] = boxes
+    return records
+
+
+def as_tuples(records, names):
+    """
+    採点結果を (label, confidence, area, total, bbox) のタプルとして1件ずつ返す。
+    表示用なので、その場で Python の値に変換する。
+    """
+    for class_id, confidence, area, total, bbox in records.tolist():
+        yield names[class_id], confidence, area, total, bbox
+
+
+class RecordStore:
+    """
+    構造化配列を追記していく入れ物。
+    容量が足りなくなったら倍に広げるので、追記のコストは平均して一定。
+    テンソルや文字列を持たないので、1件あたりのメモリは dtype のサイズだけになる。
+    """
+
+    def __init__(self, dtype=SCORE_DTYPE, capacity=64):
+        self._data = np.empty(capacity, dtype=dtype)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def extend(self, records):
+        """同じ dtype の配列をまとめて追加する"""
+        needed = self._count + len(records)
+        if needed > len(self._data):
+            capacity = max(needed, len(self._data) * 2)
+            grown = np.empty(capacity, dtype=self._data.dtype)
+            grown[:self._count] = self._data[:self._count]
+            self._data = grown
+        self._data[self._count:needed] = records
+        self._count = needed
+
+    def view(self):
+        """追加済みの部分の配列（コピーしない）"""
+        return self._data[:self._count]
+
+    def clear(self):
+        self._count = 0
+
+    def nbytes(self):
+        """追加済みの部分が使っているメモリ (バイト)"""
+        return self._count * self._data.dtype.itemsize
@@ -0,0 +1,91 @@
+import numpy as np
+
+import ScoreRecords as sr  # local unofficial
+
+# 採点ルールの表
+# - base: オブジェクトが存在するだけでもらえる点
+# - area_divisor / area_cap: 面積を area_divisor で割った点（最大 area_cap 点）
+# - confidence_peaks: (中心, 最大点, 傾き) ごとに max(最大点 - |信頼度 - 中心| * 傾き, 0) を加点
+# - label_bonus: ラベル名またはクラスIDごとの加点（表にないクラスは 0 点）
+# - integer: True なら各項目を整数に切り捨てる（DetectGame2Int 以降と同じ計算）
+
+# DetectGame2Int / DetectGame2IntSort / DetectGame2IntSortCountDown / DetectGameV1 のルール
+INTEGER_RULES = {
+    "base": 10,
+    "area_divisor": 1000,
+    "area_cap": 50,
+    "confidence_peaks": ((1.0, 20, 100), (0.5, 20, 100)),  # 100%に近い場合、または50%に近い場合に加点
+    "label_bonus": {"kinoko": 20, "takenoko": -30},
+    "integer": True,
+}
+
+# DetectGame / DetectGame2 / DetectGameGUI / DetectGame3Mac のルール（小数のまま、たけのこも加点）
+FLOAT_RULES = dict(INTEGER_RULES, label_bonus={"kinoko": 20, "takenoko": 30}, integer=False)
+
+
+def bonus_table(label_bonus, names):
+    """
+    ラベルごとの加点を、クラスIDで引ける配列にする。
+    label_bonus のキーはラベル名でもクラスIDでもよい。
+    """
+    table = np.zeros(max(names, default=-1) + 1, dtype=np.int64)
+    ids = {label: class_id for class_id, label in names.items()}
+    for key, bonus in label_bonus.items():
+        class_id = key if isinstance(key, int) else ids.get(key)
+        if class_id is not None and 0 <= class_id < len(table):
+            table[class_id] = bonus
+    return table
+
+
+class ScoringEngine:
+    """
+    ルールの表に従って、1フレーム分の検出結果をまとめて採点する。
+    1件ずつ if/elif でラベル名を比べる代わりに、クラスIDで加点の表を引いて配列全体で計算する。
+
+        scorer = ScoringEngine(INTEGER_RULES)
+        scores = scorer.score_records(objects, model.names)  # ScoreRecords.SCORE_DTYPE の配列
+    """
+
+    def __init__(self, rules=INTEGER_RULES):
+        self.rules = rules
+        self._names = None
+        self._bonus = np.zeros(0, dtype=np.int64)
+
+    def _bonus_for(self, class_ids, names):
+        # クラス名の辞書が変わったときだけ表を作り直す
+        if names is not self._names:
+            self._bonus = bonus_table(self.rules["label_bonus"], names)
+            self._names = names
+        known = (class_ids >= 0) & (class_ids < len(self._bonus))
+        return np.where(known, self._bonus[np.where(known, class_ids, 0)], 0)
+
+    def totals(self, detections, names):
+        """
+        検出結果 (ScoreRecords.DETECTION_DTYPE) の合計得点を返す。
+        integer が True なら int64、False なら float64 の配列になる。
+        """
+        rules = self.rules
+        class_ids = detections["class_id"].astype(np.int64)
+        # 1件ずつ Python の float で計算していたときと同じ結果になるように倍精度で計算する
+        confidences = detections["confidence"].astype(np.float64)
+        areas = detections["area"].astype(np.float64)
+
+        area_score = np.minimum(areas // rules["area_divisor"], rules["area_cap"])
+        confidence_score = np.zeros(len(detections), dtype=np.float64)
+        for center, height, slope in rules["confidence_peaks"]:
+            confidence_score = confidence_score + np.maximum(height - np.abs(confidences - center) * slope, 0)
+        label_score = self._bonus_for(class_ids, names)
+
+        if rules["integer"]:
+            # int() と同じく0方向に切り捨てる（どちらも負にならないので切り下げと同じ）
+            area_score = area_score.astype(np.int64)
+            confidence_score = confidence_score.astype(np.int64)
+        return rules["base"] + area_score + confidence_score + label_score
+
+    def score_records(self, detections, names):
+        """検出結果を採点し、ScoreRecords.SCORE_DTYPE の配列で返す"""
+        scores = np.zeros(len(detections), dtype=sr.SCORE_DTYPE)
+        for field in ("class_id", "confidence", "area", "bbox"):
+            scores[field] = detections[field]
+        scores["total"] = self.totals(detections, names)
+        return scores
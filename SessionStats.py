@@ -0,0 +1,94 @@
+import numpy as np
+
+# 集計する列（ScoreRecords.SCORE_DTYPE のフィールド名）
+FIELDS = ("confidence", "area", "total")
+
+
+class RunningStats:
+    """値の個数・合計・最小・最大だけを保持する（値そのものは保存しない）"""
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def add_many(self, values):
+        """配列の値をまとめて加える"""
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.sum += values.sum(dtype=np.float64).item()
+        self.min = min(self.min, values.min().item())
+        self.max = max(self.max, values.max().item())
+
+    def merge(self, other):
+        """別の RunningStats の結果を足し合わせる"""
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def get_min(self, default=0):
+        return self.min if self.count else default
+
+    def get_max(self, default=0):
+        return self.max if self.count else default
+
+
+class SessionStats:
+    """
+    採点のたびに更新する、ゲーム全体の統計。
+    信頼度・面積・加点の個数/合計/最小/最大を、全体とクラスごとに持つ。
+    メモリは採点した回数によらず一定なので、最後に全スコアを見直さなくても結果をすぐ出せる。
+
+        stats = SessionStats()
+        stats.update(frame_scores)  # ScoreRecords.SCORE_DTYPE の配列
+        stats.overall["total"].get_max()
+    """
+
+    def __init__(self):
+        self.overall = {field: RunningStats() for field in FIELDS}
+        self.per_class = {}  # クラスID -> {フィールド名: RunningStats}
+        self.total_score = 0  # 加点の合計（整数のまま足す）
+
+    @property
+    def object_count(self):
+        return self.overall["total"].count
+
+    def update(self, scores):
+        """1回分の採点結果を加える"""
+        if len(scores) == 0:
+            return
+        for field in FIELDS:
+            self.overall[field].add_many(scores[field])
+        self.total_score += int(scores["total"].sum())
+
+        class_ids = scores["class_id"]
+        for class_id in np.unique(class_ids).tolist():
+            selected = scores[class_ids == class_id]
+            stats = self.per_class.setdefault(class_id, {field: RunningStats() for field in FIELDS})
+            for field in FIELDS:
+                stats[field].add_many(selected[field])
+
+    def merge(self, other):
+        """別のセッションの統計を足し合わせる"""
+        for field in FIELDS:
+            self.overall[field].merge(other.overall[field])
+        for class_id, other_stats in other.per_class.items():
+            stats = self.per_class.setdefault(class_id, {field: RunningStats() for field in FIELDS})
+            for field in FIELDS:
+                stats[field].merge(other_stats[field])
+        self.total_score += other.total_score
+
+    def class_summary(self, names):
+        """クラスごとの (ラベル, 個数, 加点の合計, 加点の平均) をクラスID順に返す"""
+        return [
+            (names.get(class_id, str(class_id)), stats["total"].count,
+             int(stats["total"].sum), stats["total"].mean)
+            for class_id, stats in sorted(self.per_class.items())
+        ]
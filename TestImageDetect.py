@@ -1,14 +1,31 @@
+import argparse
 import cv2
 import time
-import torch
-from ultralytics import YOLO
 import sys
+
+import DisplaySink as ds  # local unofficial
+import FrameGrabber as fg  # local unofficial
+import FramePool as fp  # local unofficial
+import Detector as dt  # local unofficial
+import CaptureConfig as cc  # local unofficial
+import ModelManager as mm  # local unofficial
+
 print("Python executable:", sys.executable)
 print("Python version:", sys.version)
 
-# モデルの読み込み
-#model = YOLO("best.pt")
-model = YOLO("yolov8n.pt")
+# 表示先（ウィンドウ、またはヘッドレス）
+parser = argparse.ArgumentParser(description="YOLO detection test")
+ds.add_display_arguments(parser)
+parser.add_argument("--warmup-runs", type=int, default=mm.warmup_runs,
+                    help="推論を始める前に行う空推論の回数（0 で行わない）")
+parser.add_argument("--max-frames", type=int, default=None,
+                    help="この枚数を推論したら終わる（ヘッドレスでは 'q' で止められないので指定する）")
+options = parser.parse_args()
+display = ds.sink_from_args(options)
+
+# モデルの読み込み（カメラの準備や文字入力の間に裏で読み込む）
+#model = mm.ModelManager("best.pt").load_async()
+model = mm.ModelManager("yolov8n.pt").load_async()
 
 # カメラの初期化
 cap = cv2.VideoCapture(0)
@@ -16,12 +33,19 @@ if not cap.isOpened():
     print("Camera not connected")
     exit()
 
-# 画像サイズ設定
-screen_width = 640
-screen_height = 480
+# 画像サイズ設定（MJPG・バッファ1枚で要求し、実際に使えたサイズを使う）
+granted = cc.negotiate(cap, {"width": 640, "height": 480})
+screen_width = granted["width"]
+screen_height = granted["height"]
+
+# 推論するフレームの間隔
+frame_stride = 30
 
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, screen_width)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, screen_height)
+# 読み込みは別スレッドで行い、常に最新のフレームを使う
+# 推論しないフレームは grab() だけで読み飛ばし、デコードしない
+# デコード先のバッファは使い回す
+pool = fp.FramePool()
+grabber = fg.FrameGrabber(cap, frame_stride=frame_stride, pool=pool).start()
 
 # 表示するテキストと座標
 text = input("文字を入力") #"Hello, OpenCV!"
@@ -33,39 +57,45 @@ font_scale = 2.5                 # フォントサイズ
 color = (0, 0, 255)              # 色（B, G, R）-> 赤
 thickness = 2                    # 線の太さ
 
-# カウントとインデックス
+# カウント
 c = 0
-i = 0
+last_seq = 0
+frames = 0  # 推論した枚数
+
+# 最初の推論が遅くならないように空推論しておく（カメラから1枚も読めなかった場合は行わない）
+first_frame = grabber.peek()
+if first_frame is not None and options.warmup_runs > 0:
+    model.warmup(first_frame.shape, options.warmup_runs)
 
 while True:
-    ret, frame = cap.read()
+    ret, frame, frame_time, last_seq = grabber.wait_new(last_seq)
 
     if not ret:
         print("Failed to capture frame")
         break
 
-    if i == 0:
-        # 推論と注釈付きフレームの生成
-        predictions = model(frame)
-        annotated_frame = predictions[0].plot()
-
-        # フレームにテキストを描画
-        cv2.putText(annotated_frame, text, position, font, font_scale, color, thickness)
+    # 推論と注釈付きフレームの生成（フレームをコピーせず、読み込んだバッファに直接描く）
+    objects = model.detect_records(frame)
+    frames += 1
+    annotated_frame = dt.draw_detections(frame, objects, model.names)
 
-        # 表示
-        cv2.imshow("DXI stage2", annotated_frame)
+    # フレームにテキストを描画
+    cv2.putText(annotated_frame, text, position, font, font_scale, color, thickness)
 
-        # キー操作
-        key = cv2.waitKey(1)
-        if (key & 0xff) == ord("q"):  # 'q'キーで終了
-            break
-        elif (key & 0xff) == ord("c"):  # 'c'キーで画像保存
-            c += 1
-            fname = time.strftime("%Y%m%d%H%M%S") + ".jpg"
-            cv2.imwrite(fname, annotated_frame)
-            print(f"{c}:{fname} saved")
+    # 表示
+    display.show("DXI stage2", annotated_frame)
 
-    i = (i + 1) % 30  # フレームカウンタ
+    # キー操作
+    key = display.poll_key()
+    if key == ord("q") or (options.max_frames and frames >= options.max_frames):  # 'q'キーで終了
+        break
+    elif key == ord("c"):  # 'c'キーで画像保存
+        c += 1
+        fname = time.strftime("%Y%m%d%H%M%S") + ".jpg"
+        cv2.imwrite(fname, annotated_frame)
+        print(f"{c}:{fname} saved")
 
-cap.release()
-cv2.destroyAllWindows()
+model.print_latency_report()
+print(f"フレームのバッファ: {pool.describe()}")
+grabber.stop()
+display.close()
@@ -0,0 +1,41 @@
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+import GlyphCache as gc  # local unofficial
+
+
+def line8_is_binary():
+    """この OpenCV の putText が LINE_8 でアンチエイリアスせずに描くか（5.x は LINE_8 でもぼかす）"""
+    canvas = np.zeros((40, 200), dtype=np.uint8)
+    cv2.putText(canvas, "kinoko (040pts)", (5, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.5, 255, 2, cv2.LINE_8)
+    return set(np.unique(canvas).tolist()) <= {0, 255}
+
+
+@pytest.mark.parametrize("name", ["countdown", "label"])
+def test_cached_text_is_faster_than_puttext(name):
+    # ゲームがキャッシュで描く文字列（カウントダウンの数字と RevealAnimator のラベル）
+    direct, cached, same = gc.benchmark(runs=2000)[name]
+    assert cached < direct
+
+
+@pytest.mark.skipif(not line8_is_binary(), reason="この OpenCV は LINE_8 でもアンチエイリアスする")
+def test_cached_text_matches_puttext():
+    # フレームの端からはみ出す場合も、putText と同じ画素だけを書く
+    base = np.full((120, 160, 3), 64, dtype=np.uint8)
+    cache = gc.GlyphCache()
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    for org in [(-20, 5), (120, 118), (60, 60), (150, 200)]:
+        expected = cv2.putText(base.copy(), "takenoko (-30pts)", org, font, 0.5, (0, 255, 0), 2, cv2.LINE_8)
+        actual = cache.put_text(base.copy(), "takenoko (-30pts)", org, font, 0.5, (0, 255, 0), 2)
+        assert np.array_equal(expected, actual)
+
+
+def test_clipped_text_stays_inside_the_text_mask():
+    # はみ出す位置に描いても落ちず、書く画素はフレームの中に切り取ったマスクの分だけ
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    sprite = gc.render_sprite("takenoko (-30pts)", cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
+    gc.GlyphCache().put_text(frame, "takenoko (-30pts)", (-20, 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    assert 0 < np.count_nonzero(frame[:, :, 1]) < sprite.mask.sum()
+    assert not frame[:, :, 0].any() and not frame[:, :, 2].any()